@@ -0,0 +1,209 @@
+"""
+Benchmark suite for the market matching path.
+
+Run from backend/markets_source:
+
+    python -m benchmarks.bench_matcher --sizes 1000 10000 100000 --output benchmarks/results/latest.json
+
+Each catalogue size gets a fresh temporary storage directory, an in-process Redis
+stand-in and (by default) a hashing embedder instead of NV-Embed-v2, so runs are
+reproducible on any machine. Pass --model <sentence-transformers name> to benchmark a
+real model, and --data AllMarketsEvents.json to resample recorded markets instead of
+synthetic ones. Results are written as JSON to track regressions between versions.
+
+memory_mb.peak_rss_cumulative is the peak RSS of the whole run so far, not of one size;
+benchmark a single size per invocation to get its own peak.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+from benchmarks.stand_ins import HashingEmbedder, InMemoryRedis, NullVectorDatabase, synthetic_events, recorded_events
+from embeddings.similarity import EventMatcher
+
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    # The matcher logs per market; keep benchmark output readable
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.asarray(samples) * 1000, q)) if samples else None
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def make_matcher(model, storage_dir, args):
+    matcher = EventMatcher(
+        index_type=args.index_type,
+        index_params=json.loads(args.index_params),
+        search_mode=args.search_mode,
+        model=model,
+        vector_db=NullVectorDatabase(),
+    )
+    matcher.data_sources = {'all_markets': os.path.join(storage_dir, 'AllMarketsEvents.json')}
+    matcher.redis_client = InMemoryRedis()
+    return matcher
+
+
+def make_queries(events, count, seed):
+    # Perturbed catalogue headlines: close to a known market but never identical
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(events), min(count, len(events)), replace=False)
+    return [f"Breaking: {events[i]['headline']} says report" for i in picks]
+
+
+async def bench_size(size, model, args):
+    events = recorded_events(args.data, size, args.seed) if args.data else synthetic_events(size, args.seed)
+    queries = make_queries(events, args.queries, args.seed)
+    result = {'markets': size, 'queries': len(queries)}
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        # Cold start: every text goes through the encoder
+        matcher = make_matcher(model, storage_dir, args)
+        with quiet(not args.verbose):
+            start = time.perf_counter()
+            await matcher.generate_embeddings('all_markets', events)
+            cold_embed_s = time.perf_counter() - start
+            start = time.perf_counter()
+            index = matcher.build_index('all_markets')
+            index_build_s = time.perf_counter() - start
+        result['encode'] = {
+            'cold_seconds': cold_embed_s,
+            'texts_per_sec': matcher.bulk_encoder.stats.get('texts_per_sec'),
+            'unique_texts': matcher.bulk_encoder.stats.get('texts'),
+        }
+        result['index_build_seconds'] = index_build_s
+
+        # Warm start: a new process-equivalent matcher over the same on-disk store and index
+        redis_client = matcher.redis_client
+        warm = make_matcher(model, storage_dir, args)
+        warm.redis_client = redis_client
+        with quiet(not args.verbose):
+            start = time.perf_counter()
+            await warm.generate_embeddings('all_markets', events)
+            warm.build_index('all_markets')
+            result['warm_start_seconds'] = time.perf_counter() - start
+
+        # Query latency; the query cache is cleared so every call pays for encoding too
+        latencies = {'approximate': [], 'exact': []}
+        with quiet(not args.verbose):
+            for exact, name in ((False, 'approximate'), (True, 'exact')):
+                for headline in queries:
+                    warm.query_cache.clear()
+                    start = time.perf_counter()
+                    warm.find_similar_events(headline, k=args.k, threshold=-1.0, exact=exact)
+                    latencies[name].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            warm.find_similar_events_batch(queries, k=args.k, threshold=-1.0, exact=True)
+            batch_s = time.perf_counter() - start
+        result['find_similar_events_ms'] = {
+            name: {'p50': percentile_ms(samples, 50), 'p99': percentile_ms(samples, 99)}
+            for name, samples in latencies.items()
+        }
+        result['batch_ms_per_query'] = batch_s * 1000 / len(queries)
+
+        # Recall of the configured search path against the exact scan. Duplicate headlines
+        # tie exactly, so a hit is any result scoring at least the exact k-th best score.
+        query_embeddings = warm.encode_queries(queries)
+        approx_scores, approx_ids = warm.search('all_markets', query_embeddings, args.k)
+        exact_scores, _ = warm.search('all_markets', query_embeddings, args.k, exact=True)
+        kth_best = exact_scores[:, -1:] - 1e-5
+        hits = ((approx_ids >= 0) & (approx_scores >= kth_best)).sum()
+        result['recall_at_k'] = float(hits / max(1, np.isfinite(exact_scores).sum()))
+
+        compressed = warm.compressed.get('all_markets')
+        result['memory_mb'] = {
+            'embeddings': warm.embeddings['all_markets'].nbytes / 1e6,
+            # The index references the store's memory map, so only its own structures count
+            'index': sum(getattr(index, name).nbytes for name in ('inv_norms', 'rows', 'centroids', 'list_ids')
+                         if getattr(index, name, None) is not None) / 1e6,
+            'compressed': compressed.nbytes / 1e6 if compressed is not None else None,
+            # ru_maxrss is the process-wide peak, so this includes every size benchmarked before
+            'peak_rss_cumulative': peak_rss_mb(),
+        }
+    return result
+
+
+async def run(args):
+    if args.model == 'hashing':
+        model = HashingEmbedder(args.dim)
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(args.model, device='cpu')
+
+    report = {
+        'version': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'model': args.model,
+        'index_type': args.index_type,
+        'index_params': json.loads(args.index_params),
+        'search_mode': args.search_mode,
+        'k': args.k,
+        'results': [],
+    }
+    for size in args.sizes:
+        print(f"Benchmarking {size} markets...")
+        result = await bench_size(size, model, args)
+        latency = result['find_similar_events_ms']['approximate']
+        print(f"  p50 {latency['p50']:.2f} ms, p99 {latency['p99']:.2f} ms, "
+              f"recall@{args.k} {result['recall_at_k']:.3f}, warm start {result['warm_start_seconds']:.2f}s")
+        report['results'].append(result)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+        print(f"Wrote benchmark results to {args.output}")
+    else:
+        print(json.dumps(report, indent=4))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark EventMatcher as the market catalogue grows.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--model', default='hashing', help="'hashing' or a sentence-transformers model name")
+    parser.add_argument('--dim', type=int, default=256, help="Dimension of the hashing stand-in model")
+    parser.add_argument('--data', help="Recorded AllMarketsEvents.json to resample instead of synthetic data")
+    parser.add_argument('--index-type', default='ivf')
+    parser.add_argument('--index-params', default='{}', help="JSON, e.g. '{\"n_probe\": 16}'")
+    parser.add_argument('--search-mode', default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write results JSON here instead of stdout")
+    parser.add_argument('--verbose', action='store_true')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import random
+import re
+import numpy as np
+
+# Synthetic headline vocabulary shaped like the Kalshi / Polymarket / PredictIt catalogue
+SUBJECTS = [
+    'Tim Cook', 'Elon Musk', 'the Fed', 'Bitcoin', 'Ethereum', 'Kamala Harris', 'Donald Trump',
+    'the S&P 500', 'Nvidia', 'Apple', 'OpenAI', 'the Lakers', 'Duke', 'UNC', 'Taylor Swift',
+    'the Senate', 'the House', 'Germany', 'France', 'Israel', 'Ukraine', 'China', 'Tesla', 'Gold',
+]
+PREDICATES = [
+    'leaves {org} before {date}', 'wins the {race}', 'cuts rates by {n} bps in {month}',
+    'closes above ${n}k on {date}', 'announces {product} in {month}', 'beats {rival}',
+    'reaches {n}% approval by {date}', 'is indicted before {date}', 'releases a new album in {month}',
+]
+FILLERS = {
+    'org': ['Apple', 'Tesla', 'the Fed', 'Congress', 'OpenAI'],
+    'race': ['2024 election', 'Super Bowl', 'NBA Finals', 'Senate race', 'primary'],
+    'month': ['January', 'March', 'June', 'September', 'December'],
+    'date': ['Dec 31, 2024', 'Jun 30, 2025', 'Mar 1, 2025', 'Nov 5, 2024'],
+    'product': ['an AI model', 'a new iPhone', 'a merger', 'a stock split'],
+    'rival': ['UNC', 'Duke', 'the Celtics', 'the Chiefs'],
+}
+SOURCES = ['Kalshi', 'Polymarket', 'PredictIt']
+
+
+def synthetic_events(count, seed=0):
+    """StandardizedEvent-shaped dicts with templated headlines."""
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        predicate = rng.choice(PREDICATES).format(
+            n=rng.randint(1, 150), **{key: rng.choice(values) for key, values in FILLERS.items()}
+        )
+        events.append({
+            'source': rng.choice(SOURCES),
+            'market_id': f'SYN-{i}',
+            'status': 'Active',
+            'headline': f'Will {rng.choice(SUBJECTS)} {predicate}?',
+            'description': '',
+            'end_date': '2025-01-01T00:00:00Z',
+            'yes_ask': round(rng.random(), 2),
+            'no_ask': round(rng.random(), 2),
+            'liquidity': rng.randint(0, 1_000_000),
+        })
+    return events
+
+
+def recorded_events(path, count, seed=0):
+    """Resample a recorded AllMarketsEvents.json up to `count` events with unique market ids."""
+    with open(path, 'r', encoding='utf-8') as file:
+        base = json.load(file)
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        event = dict(base[i % len(base)] if i < len(base) else rng.choice(base))
+        if i >= len(base):
+            event['market_id'] = f"{event['market_id']}-{i}"
+        events.append(event)
+    return events
+
+
+class HashingEmbedder:
+    """
+    Small deterministic stand-in for the sentence embedding model: hashed bag of word
+    unigrams and bigrams projected to `dim` dimensions. Exposes the encode() subset
+    EventMatcher uses and needs no model download.
+    """
+    tokenizer = None
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def _embed(self, text):
+        words = re.findall(r'\w+', text.lower())
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in words + [f'{a} {b}' for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        return vector
+
+    def encode(self, sentences, batch_size=None, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.stack([self._embed(text) for text in texts]) if texts else np.empty((0, self.dim), np.float32)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            embeddings = embeddings / norms
+        return embeddings[0] if single else embeddings
+
+
+class InMemoryRedis:
+    """Async in-process stand-in for the redis.asyncio commands EventMatcher calls."""
+
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+
+    @staticmethod
+    def _key(key):
+        return key.encode('utf-8') if isinstance(key, str) else key
+
+    async def ping(self):
+        return True
+
+    async def get(self, key):
+        return self.values.get(self._key(key))
+
+    async def set(self, key, value, ex=None):
+        self.values[self._key(key)] = value
+
+    async def mget(self, *keys):
+        return [self.values.get(self._key(key)) for key in keys]
+
+    async def mset(self, mapping):
+        for key, value in mapping.items():
+            self.values[self._key(key)] = value
+
+    async def delete(self, *keys):
+        # DEL removes keys of any type, hashes included
+        return sum((self.values.pop(self._key(key), None) is not None) | (self.hashes.pop(self._key(key), None) is not None)
+                   for key in keys)
+
+    async def hgetall(self, name):
+        return dict(self.hashes.get(self._key(name), {}))
+
+    async def hset(self, name, mapping):
+        target = self.hashes.setdefault(self._key(name), {})
+        for key, value in mapping.items():
+            target[self._key(key)] = self._key(value)
+
+    async def hdel(self, name, *keys):
+        target = self.hashes.get(self._key(name), {})
+        return sum(target.pop(self._key(key), None) is not None for key in keys)
+
+
+class NullVectorDatabase:
+    """Discards writes so benchmarks measure the matcher rather than MongoDB."""
+
+    def upsert_documents(self, documents, **kwargs):
+        documents = list(documents)
+        return {'upserted': len(documents), 'modified': 0, 'failed': 0}
+
+    def update_metadata(self, documents, **kwargs):
+        return len(list(documents))
+
+    def delete_documents(self, names, **kwargs):
+        return len(list(names))
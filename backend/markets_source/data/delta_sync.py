@@ -0,0 +1,110 @@
+import json
+import os
+from datetime import datetime, timezone
+from .event_models import StandardizedEvent, event_fingerprint
+
+
+class MarketDelta:
+    """Markets of one venue that were added, changed or closed since its last checkpoint."""
+
+    def __init__(self, venue, added=None, changed=None, closed=None):
+        self.venue = venue
+        self.added = added or []      # event dicts
+        self.changed = changed or []  # event dicts
+        self.closed = closed or []    # market ids no longer listed as open
+
+    def __len__(self):
+        return len(self.added) + len(self.changed) + len(self.closed)
+
+    def upserts(self):
+        return self.added + self.changed
+
+    def to_dict(self):
+        return {"venue": self.venue, "added": self.added, "changed": self.changed, "closed": self.closed}
+
+    def summary(self):
+        return f"{self.venue}: {len(self.added)} added, {len(self.changed)} changed, {len(self.closed)} closed"
+
+
+class DeltaSync:
+    """
+    Per-venue checkpoints of market fingerprints (see event_fingerprint).
+
+    `diff()` compares a fresh listing against the venue's checkpoint and returns only the
+    churn; `commit()` records the listing once the delta has been persisted and applied, so a crash
+    in between re-emits the same delta on the next run instead of losing it.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def checkpoint_path(self, venue):
+        return os.path.join(self.directory, f"{venue}.json")
+
+    def load(self, venue):
+        """The venue's checkpointed {market_id: fingerprint}; empty on the first run."""
+        path = self.checkpoint_path(venue)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)["fingerprints"]
+
+    @staticmethod
+    def fingerprints(events):
+        """{market_id: fingerprint} of a listing, the form checkpoints are stored in."""
+        return {str(event.market_id if isinstance(event, StandardizedEvent) else event['market_id']):
+                event_fingerprint(event) for event in events}
+
+    def diff(self, venue, events, previous=None):
+        """Delta of `events` against the venue's checkpoint, or against `previous` fingerprints if given."""
+        events = [event.to_dict() if isinstance(event, StandardizedEvent) else event for event in events]
+        if previous is None:
+            previous = self.load(venue)
+        delta = MarketDelta(venue)
+        seen = set()
+        for event in events:
+            market_id = str(event['market_id'])
+            seen.add(market_id)
+            fingerprint = previous.get(market_id)
+            if fingerprint is None:
+                delta.added.append(event)
+            elif fingerprint != event_fingerprint(event):
+                delta.changed.append(event)
+        delta.closed = [market_id for market_id in previous if market_id not in seen]
+        return delta
+
+    def commit(self, venue, events):
+        self.commit_fingerprints(venue, self.fingerprints(events))
+
+    def commit_fingerprints(self, venue, fingerprints):
+        """Checkpoint {market_id: fingerprint}, e.g. accumulated page by page while streaming."""
+        path = self.checkpoint_path(venue)
+        # Write then rename so a crash never leaves a truncated checkpoint behind
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump({
+                "venue": venue,
+                "synced_at": datetime.now(timezone.utc).isoformat(),
+                "fingerprints": fingerprints
+            }, file)
+        os.replace(path + '.tmp', path)
+
+
+def apply_delta(catalogue, delta):
+    """
+    Return `catalogue` (event dicts of all venues) with one venue's delta applied.
+
+    Existing entries are updated in place so the order is preserved; added markets that are
+    already present (e.g. the first delta run over a full snapshot) replace them too.
+    """
+    closed = set(delta.closed)
+    updates = {str(event['market_id']): event for event in delta.upserts()}
+    merged = []
+    for event in catalogue:
+        market_id = str(event['market_id'])
+        if event['source'] == delta.venue:
+            if market_id in closed:
+                continue
+            event = updates.pop(market_id, event)
+        merged.append(event)
+    return merged + list(updates.values())
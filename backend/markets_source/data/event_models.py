@@ -1,5 +1,17 @@
+import hashlib
+import json
 import re
+import sys
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+EVENT_FIELDS = ("source", "market_id", "status", "headline", "description", "end_date", "yes_ask", "no_ask", "liquidity")
+
+
 class StandardizedEvent:
+    # No per-instance __dict__: a catalogue of these is a few hundred bytes per market lighter
+    __slots__ = EVENT_FIELDS
+
     def __init__(self, source, market_id, status, headline, description, end_date, yes_ask, no_ask, liquidity):
         self.source = source
         self.market_id = market_id
@@ -24,4 +36,243 @@ class StandardizedEvent:
             "liquidity": self.liquidity
         }
 
-      
\ No newline at end of file
+    @classmethod
+    def from_dict(cls, data):
+        return cls(*(data.get(name) for name in EVENT_FIELDS))
+
+      
+
+def parse_end_date(value):
+    """Parse a venue end date (ISO 8601, 'Z' suffix allowed) to an aware UTC datetime, or None."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None  # e.g. PredictIt's 'N/A'
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+# Keyword filters accepted by the metadata-filtered searches of EventMatcher and VectorDatabase
+METADATA_FILTERS = ('source', 'status', 'ends_within_days', 'ends_after', 'ends_before', 'min_liquidity', 'max_liquidity')
+
+
+def end_date_bounds(filters, now=None):
+    """Resolve the end-date filters to an (after, before) pair of aware datetimes, either may be None."""
+    now = now or datetime.now(timezone.utc)
+    after = filters.get('ends_after')
+    before = filters.get('ends_before')
+    if filters.get('ends_within_days') is not None:
+        within = now + timedelta(days=filters['ends_within_days'])
+        before = min(before, within) if before else within
+        after = max(after, now) if after else now
+    return after, before
+
+
+def event_metadata(event):
+    """Filterable metadata of an event dict: source, status, end_date (datetime) and liquidity."""
+    liquidity = event.get('liquidity')
+    return {
+        "source": event.get('source'),
+        "status": event.get('status'),
+        "end_date": parse_end_date(event.get('end_date')),
+        "liquidity": float(liquidity) if liquidity is not None else None
+    }
+
+
+# Numeric event fields; an EventTable stores them as float64 with NaN for missing values
+PRICE_FIELDS = ("yes_ask", "no_ask", "liquidity")
+
+
+def canonical_event(event):
+    """
+    Event dict in the form EventTable rows read back as: numeric fields as float or None.
+
+    Venues hand out ints (e.g. Kalshi liquidity 12345) that come back from a table as
+    12345.0, so anything compared across the two forms goes through this first.
+    """
+    event = event.to_dict() if isinstance(event, StandardizedEvent) else dict(event)
+    for name in PRICE_FIELDS:
+        value = _as_float(event.get(name))
+        event[name] = None if np.isnan(value) else value
+    return event
+
+
+def event_fingerprint(event):
+    """Stable hash of every field of an event (StandardizedEvent, dict or table row); changes when any field does."""
+    payload = json.dumps(canonical_event(event), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class EventTable:
+    """
+    Array-backed, column-oriented collection of events.
+
+    - source/status are interned categoricals: an int32 code per row plus a list of values
+    - market_id/headline/description/end_date are object arrays sharing the original strings
+    - yes_ask/no_ask/liquidity and the parsed end timestamp (`end_ts`) are float64 with NaN
+      for missing values
+
+    Rows read back as plain dicts (`table[i]`, iteration), so code written against lists of
+    event dicts keeps working, while `column()` hands out the float columns without copying.
+    Metadata filtering lives in embeddings.metadata_index.MetadataIndex.
+    """
+    CATEGORICAL = ("source", "status")
+    OBJECT = ("market_id", "headline", "description", "end_date")
+    FLOAT = PRICE_FIELDS
+
+    def __init__(self, codes, categories, objects, floats, end_ts):
+        self.codes = codes
+        self.categories = categories
+        self.objects = objects
+        self.floats = floats
+        self.end_ts = end_ts
+
+    @classmethod
+    def from_events(cls, events):
+        """Build from StandardizedEvents, event dicts or another EventTable."""
+        if isinstance(events, EventTable):
+            return events
+        rows = [event.to_dict() if isinstance(event, StandardizedEvent) else event for event in events]
+        n = len(rows)
+        codes, categories = {}, {}
+        for name in cls.CATEGORICAL:
+            codes[name], categories[name] = _categorical(row.get(name) for row in rows)
+        objects = {}
+        for name in cls.OBJECT:
+            column = np.empty(n, dtype=object)
+            column[:] = [row.get(name) for row in rows]
+            objects[name] = column
+        floats = {name: np.array([_as_float(row.get(name)) for row in rows], dtype=np.float64) for name in cls.FLOAT}
+        end_ts = np.array([_timestamp(parse_end_date(value)) for value in objects['end_date']], dtype=np.float64)
+        return cls(codes, categories, objects, floats, end_ts)
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Build from a mapping of column name -> sequence (e.g. pyarrow Table.to_pydict() or NumPy arrays)."""
+        n = len(columns["market_id"])
+        codes, categories = {}, {}
+        for name in cls.CATEGORICAL:
+            codes[name], categories[name] = _categorical(columns.get(name, [None] * n))
+        objects = {}
+        for name in cls.OBJECT:
+            column = np.empty(n, dtype=object)
+            column[:] = list(columns.get(name, [None] * n))
+            objects[name] = column
+        floats = {}
+        for name in cls.FLOAT:
+            values = columns.get(name)
+            if values is None:
+                floats[name] = np.full(n, np.nan)
+            elif isinstance(values, np.ndarray) and values.dtype == np.float64:
+                floats[name] = values
+            else:
+                floats[name] = np.array([_as_float(value) for value in values], dtype=np.float64)
+        end_ts = np.array([_timestamp(parse_end_date(value)) for value in objects['end_date']], dtype=np.float64)
+        return cls(codes, categories, objects, floats, end_ts)
+
+    def __len__(self):
+        return len(self.end_ts)
+
+    def row(self, i):
+        row = {}
+        for name in EVENT_FIELDS:
+            if name in self.codes:
+                row[name] = self.categories[name][self.codes[name][i]]
+            elif name in self.objects:
+                row[name] = self.objects[name][i]
+            else:
+                value = self.floats[name][i]
+                row[name] = None if np.isnan(value) else float(value)
+        return row
+
+    def __getitem__(self, i):
+        return self.row(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def event(self, i):
+        return StandardizedEvent.from_dict(self.row(i))
+
+    def events(self):
+        for i in range(len(self)):
+            yield self.event(i)
+
+    def to_dicts(self):
+        return list(self)
+
+    def column(self, name):
+        """
+        NumPy array for one column. Float columns and `end_ts` are returned without copying
+        (read-only views); categoricals are decoded from their codes.
+        """
+        if name == 'end_ts':
+            values = self.end_ts
+        elif name in self.floats:
+            values = self.floats[name]
+        elif name in self.objects:
+            values = self.objects[name]
+        elif name in self.codes:
+            categories = np.empty(len(self.categories[name]), dtype=object)
+            categories[:] = self.categories[name]
+            return categories[self.codes[name]]
+        else:
+            raise KeyError(name)
+        view = values.view()
+        view.flags.writeable = False
+        return view
+
+    def to_numpy(self, columns=None):
+        return {name: self.column(name) for name in (columns or EVENT_FIELDS)}
+
+    def take(self, rows):
+        rows = np.asarray(rows)
+        return EventTable(
+            {name: codes[rows] for name, codes in self.codes.items()},
+            self.categories,
+            {name: values[rows] for name, values in self.objects.items()},
+            {name: values[rows] for name, values in self.floats.items()},
+            self.end_ts[rows],
+        )
+
+    @classmethod
+    def concat(cls, tables):
+        """The rows of `tables` in order as one table; categorical codes are remapped to shared categories."""
+        codes, categories = {}, {}
+        for name in cls.CATEGORICAL:
+            lookup = {}
+            parts = []
+            for table in tables:
+                remap = np.array([lookup.setdefault(value, len(lookup)) for value in table.categories[name]], dtype=np.int32)
+                parts.append(remap[table.codes[name]])
+            codes[name], categories[name] = np.concatenate(parts), list(lookup)
+        return cls(
+            codes,
+            categories,
+            {name: np.concatenate([table.objects[name] for table in tables]) for name in cls.OBJECT},
+            {name: np.concatenate([table.floats[name] for table in tables]) for name in cls.FLOAT},
+            np.concatenate([table.end_ts for table in tables]),
+        )
+
+
+def _categorical(values):
+    # Codes in first-seen order; the distinct values are interned so every table shares them
+    lookup = {}
+    codes = np.fromiter((lookup.setdefault(value, len(lookup)) for value in values), dtype=np.int32)
+    categories = [sys.intern(value) if isinstance(value, str) else value for value in lookup]
+    return codes, categories
+
+
+def _as_float(value):
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _timestamp(value):
+    return value.timestamp() if value is not None else np.nan
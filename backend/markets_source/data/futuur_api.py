@@ -1,89 +1,165 @@
-import requests
-import json
-import os
-from event_models import StandardizedEvent
-from dotenv import load_dotenv
+import asyncio
 import hashlib
 import hmac
-import datetime
-import requests
-from collections import OrderedDict
+import os
+import time
 from urllib.parse import urlencode
+import requests
+from dotenv import load_dotenv
+from .event_models import StandardizedEvent
+from .http_client import get_json
 
-load_dotenv()
-PUBLIC_KEY = os.getenv("FUTUUR_PUBLIC_KEY")
-PRIVATE_KEY = os.getenv("FUTUUR_PRIVATE_KEY")
-print(PUBLIC_KEY, PRIVATE_KEY)
 BASE_URL = "https://api.futuur.com/api/v1/"
-
-def build_signature(params: dict):
-    params_to_sign = OrderedDict(sorted(list(params.items())))
-
-    params_to_sign = urlencode(params_to_sign)
-
-    encoded_params = params_to_sign.encode('utf-8')
-    encoded_private_key = PRIVATE_KEY.encode('utf-8')
-
-    data = {
-        'hmac': hmac.new(encoded_private_key, encoded_params, hashlib.sha512).hexdigest(),
-        'Timestamp': params['Timestamp']
-    }
-
-    return data
-
-
-def build_headers(params: dict):
-    signature = build_signature(params)
-    headers = {
-        'Key': PUBLIC_KEY,
-        'Timestamp': str(signature.get('Timestamp')),
-        'HMAC': signature.get('hmac')
-    }
-    return headers
-
-
-signature = build_signature({
-    'Key': PUBLIC_KEY,
-    'Timestamp': int(datetime.datetime.utcnow().timestamp()),
-    'category': 5
-})
-
-
-headers = build_headers({
-    'Key': PUBLIC_KEY,
-    'Timestamp': int(datetime.datetime.utcnow().timestamp()),
-    'category': 5
-})
-
-def call_api(endpoint: str, params: dict = None, payload: dict = None, method: str = 'GET') -> dict:
-    url_params = '?' + urlencode(params) if params else ''
-    headers = build_headers(params or payload)
-    url = BASE_URL + endpoint + url_params
-
-    request_kwargs = {
-        'method': method,
-        'url': url,
-        'headers': headers,
-    }
-    if method.upper() == 'POST' and payload is not None:
-        request_kwargs['json'] = payload
-
-    response = requests.request(**request_kwargs)
-    return response.json()
-
-response = call_api(
-    endpoint='markets/',
-    params={
-        'Key': PUBLIC_KEY,
-        'Timestamp': int(datetime.datetime.utcnow().timestamp()),
-        'currency_mode': 'real_money',
-        'hide_my_bets': 'true',
-        'limit': 1000,
-        'live': 'false',
-
-    },
-    method='GET'
-)
-# print with indent
-
-print(json.dumps(response, indent=4))
\ No newline at end of file
+# Preferred price currencies when an outcome is quoted in several
+PRICE_CURRENCIES = ("USDC", "USDT", "BTC", "ETH")
+
+
+class FutuurAPI:
+    def __init__(self, public_key=None, private_key=None):
+        load_dotenv()
+        self.public_key = public_key or os.getenv("FUTUUR_PUBLIC_KEY")
+        private_key = private_key or os.getenv("FUTUUR_PRIVATE_KEY")
+        self.markets_url = f"{BASE_URL}markets/"
+        self.headers = {'Accept': 'application/json'}
+        self.params = {"currency_mode": "real_money", "hide_my_bets": "true", "live": "false"}
+        self.page_size = 200
+        # Keyed HMAC state built once; each request signs a copy of it
+        self._hmac = hmac.new(private_key.encode('utf-8'), digestmod=hashlib.sha512) if private_key else None
+
+    @property
+    def configured(self):
+        return bool(self.public_key) and self._hmac is not None
+
+    def sign(self, params):
+        """
+        Add Key and Timestamp to `params` and return (params, auth headers).
+
+        The HMAC-SHA512 covers the url-encoded params sorted by name, Key and Timestamp included.
+        """
+        if not self.configured:
+            raise RuntimeError("FUTUUR_PUBLIC_KEY and FUTUUR_PRIVATE_KEY must be set")
+        timestamp = int(time.time())
+        params = {**params, "Key": self.public_key, "Timestamp": timestamp}
+        mac = self._hmac.copy()
+        mac.update(urlencode(sorted(params.items())).encode('utf-8'))
+        headers = {**self.headers, 'Key': self.public_key, 'Timestamp': str(timestamp), 'HMAC': mac.hexdigest()}
+        return params, headers
+
+    def _page_params(self, offset):
+        return {**self.params, "limit": self.page_size, "offset": offset}
+
+    @staticmethod
+    def _price(outcome):
+        price = outcome.get('price')
+        if not isinstance(price, dict):
+            return price
+        for currency in PRICE_CURRENCIES:
+            if price.get(currency) is not None:
+                return price[currency]
+        return next((value for value in price.values() if isinstance(value, (int, float))), None)
+
+    def process_markets_to_events(self, markets):
+        standardized_events = []
+        for market in markets:
+            market_id = market.get('id')
+            title = market.get('title', '')
+            status = 'Active' if str(market.get('status', 'open')).lower() in ('open', 'active') else 'Inactive'
+            description = market.get('description') or market.get('slug')
+            end_date = market.get('bet_end_date')
+            liquidity = market.get('liquidity')  # Not returned by every listing
+            outcomes = market.get('outcomes', [])
+            prices = {str(outcome.get('title', '')).lower(): self._price(outcome) for outcome in outcomes}
+
+            if set(prices) == {'yes', 'no'}:
+                # Binary market: one event priced by its Yes and No outcomes
+                standardized_events.append(StandardizedEvent(
+                    source="Futuur",
+                    market_id=market_id,
+                    status=status,
+                    headline=title,
+                    description=description,
+                    end_date=end_date,
+                    yes_ask=prices['yes'],
+                    no_ask=prices['no'],
+                    liquidity=liquidity
+                ))
+                continue
+            # Multi-outcome market: one event per outcome, like PredictIt contracts
+            for outcome in outcomes:
+                yes_ask = self._price(outcome)
+                standardized_events.append(StandardizedEvent(
+                    source="Futuur",
+                    market_id=f"{market_id}-{outcome.get('id')}",
+                    status=status,
+                    headline=f"{title} - {outcome.get('title')}",
+                    description=description,
+                    end_date=end_date,
+                    yes_ask=yes_ask,
+                    no_ask=1 - yes_ask if yes_ask is not None else None,
+                    liquidity=liquidity
+                ))
+        return standardized_events
+
+    @staticmethod
+    def _has_next(data):
+        return bool((data.get('pagination') or {}).get('next'))
+
+    def fetch_markets(self):
+        all_events = []
+        offset = 0
+        try:
+            with requests.Session() as session:
+                while True:
+                    params, headers = self.sign(self._page_params(offset))
+                    response = session.get(self.markets_url, params=params, headers=headers)
+                    if response.status_code != 200:
+                        print(f"Error fetching data from Futuur: {response.status_code}")
+                        return []
+                    data = response.json()
+                    results = data.get('results', [])
+                    all_events.extend(self.process_markets_to_events(results))
+                    if not results or not self._has_next(data):
+                        return all_events
+                    offset += len(results)
+        except Exception as e:
+            print(f"Failed to fetch data from Futuur: {e}")
+            return []
+
+    async def aiter_market_pages(self, client=None):
+        """
+        Yield the StandardizedEvents of each page of markets over the shared connection pool.
+
+        Every page request is signed with a fresh timestamp, so responses are not cached.
+        Offsets are known in advance, so the next page is requested before the current one is
+        normalized and yielded.
+        """
+        def page_request(offset):
+            params, headers = self.sign(self._page_params(offset))
+            return asyncio.ensure_future(get_json(self.markets_url, params=params, headers=headers, client=client))
+
+        offset = 0
+        request = page_request(offset)
+        try:
+            while request is not None:
+                status, data = await request
+                request = None
+                if data is None:
+                    raise RuntimeError(f"Futuur page at offset {offset} failed with status {status}")
+                results = data.get('results', [])
+                if results and self._has_next(data):
+                    offset += len(results)
+                    request = page_request(offset)
+                yield self.process_markets_to_events(results)
+        finally:
+            if request is not None:
+                request.cancel()
+
+    async def fetch_markets_async(self, client=None):
+        try:
+            all_events = []
+            async for events in self.aiter_market_pages(client):
+                all_events.extend(events)
+            return all_events
+        except Exception as e:
+            print(f"Failed to fetch data from Futuur: {e}")
+            return []
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from urllib.parse import urlencode
+from storage import STORAGE_DIR
+
+DEFAULT_CACHE_DIR = os.path.join(STORAGE_DIR, 'http_cache')
+
+
+class HTTPCache:
+    """
+    On-disk cache of venue responses for conditional requests.
+
+    For every URL + query it keeps the last 200 body (`<key>.body`) and its ETag /
+    Last-Modified validators and body hash (`<key>.json`). get_json sends the validators
+    as If-None-Match / If-Modified-Since; a 304 is answered from the stored body. The
+    parsed and normalized result of the last body of up to `max_results` keys is memoized
+    in memory (least recently used first out), so a 304 or a 200 with an identical body
+    skips JSON parsing and normalization altogether.
+
+    Paginated walks key their pages by position rather than by cursor and call `retain`
+    once a walk completes, so the entries of one listing stay bounded by its page count.
+    """
+
+    def __init__(self, directory=None, max_results=64):
+        self.directory = directory or os.getenv("HTTP_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_results = max_results
+        self.entries = {}
+        self.results = OrderedDict()
+        self.keys_by_url = None
+        self.stats = {'not_modified': 0, 'unchanged': 0, 'changed': 0}
+
+    @staticmethod
+    def key(url, params=None):
+        query = urlencode(sorted((params or {}).items()))
+        return hashlib.sha1(f"{url}?{query}".encode('utf-8')).hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, f"{key}.{suffix}")
+
+    def entry(self, key):
+        """Stored validators and body hash for `key`, or None."""
+        if key not in self.entries:
+            try:
+                with open(self._path(key, 'json'), 'r', encoding='utf-8') as file:
+                    self.entries[key] = json.load(file)
+            except (OSError, ValueError):
+                return None
+        return self.entries[key]
+
+    def conditional_headers(self, key):
+        entry = self.entry(key)
+        if entry is None or not os.path.exists(self._path(key, 'body')):
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def body(self, key):
+        with open(self._path(key, 'body'), 'rb') as file:
+            return file.read()
+
+    def store(self, key, url, body, etag=None, last_modified=None):
+        """Record a 200 body; returns (body_hash, changed) where changed compares with the stored hash."""
+        body_hash = hashlib.sha1(body).hexdigest()
+        previous = self.entry(key)
+        changed = previous is None or previous.get('body_hash') != body_hash
+        os.makedirs(self.directory, exist_ok=True)
+        if changed:
+            # Body first, then metadata, each via rename, so a crash never pairs new validators with an old body
+            with open(self._path(key, 'body.tmp'), 'wb') as file:
+                file.write(body)
+            os.replace(self._path(key, 'body.tmp'), self._path(key, 'body'))
+        entry = {'url': url, 'etag': etag, 'last_modified': last_modified, 'body_hash': body_hash}
+        if entry != previous:
+            with open(self._path(key, 'json.tmp'), 'w', encoding='utf-8') as file:
+                json.dump(entry, file)
+            os.replace(self._path(key, 'json.tmp'), self._path(key, 'json'))
+        self.entries[key] = entry
+        if self.keys_by_url is not None:
+            self.keys_by_url.setdefault(url, set()).add(key)
+        self.stats['changed' if changed else 'unchanged'] += 1
+        return body_hash, changed
+
+    def not_modified(self, key):
+        self.stats['not_modified'] += 1
+        return self.entry(key)['body_hash']
+
+    def result(self, key, body_hash, parse, body=None):
+        """parse(body) for the current body of `key`, reusing the last result while the body hash is the same."""
+        cached = self.results.get(key)
+        if cached is not None and cached[0] == body_hash:
+            self.results.move_to_end(key)
+            return cached[1]
+        result = parse(body if body is not None else self.body(key))
+        self.results[key] = (body_hash, result)
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_results:
+            self.results.popitem(last=False)
+        return result
+
+    def _keys_of(self, url):
+        if self.keys_by_url is None:
+            # Index the entries left by earlier processes once; store() keeps it current after that
+            self.keys_by_url = {}
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                names = []
+            for name in names:
+                if name.endswith('.json'):
+                    entry = self.entry(name[:-len('.json')])
+                    if entry is not None:
+                        self.keys_by_url.setdefault(entry.get('url'), set()).add(name[:-len('.json')])
+        return self.keys_by_url.get(url, set())
+
+    def retain(self, url, keys):
+        """Drop every entry of `url` except `keys`, e.g. pages past the end of a listing that shrank."""
+        keys = set(keys)
+        stale = self._keys_of(url) - keys
+        for key in stale:
+            self.results.pop(key, None)
+            self.entries.pop(key, None)
+            for suffix in ('body', 'json'):
+                try:
+                    os.remove(self._path(key, suffix))
+                except FileNotFoundError:
+                    pass
+        self.keys_by_url[url] = self.keys_by_url.get(url, set()) & keys
+        return len(stale)
+
+
+_default_cache = None
+
+
+def default_http_cache():
+    """Process-wide HTTPCache under HTTP_CACHE_DIR (default storage/http_cache)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = HTTPCache()
+    return _default_cache
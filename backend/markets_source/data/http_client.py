@@ -0,0 +1,142 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+import httpx
+
+# Connection pool shared by every venue client: keep-alive connections are reused across
+# Kalshi cursor pages and across venues instead of a new TLS handshake per request
+POOL_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=30)
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+
+# Requests per second allowed per venue host (bursts up to the same number)
+HOST_RATE_LIMITS = {
+    "gamma-api.polymarket.com": 10,
+    "trading-api.kalshi.com": 10,
+    "api.futuur.com": 5,
+}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_client = None
+_client_loop = None
+_limiters = {}
+
+
+class RateLimiter:
+    """Async token bucket: `rate` requests per second with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def rate_limiter(host):
+    """The shared limiter for `host`, or None when the host has no configured limit."""
+    if host not in HOST_RATE_LIMITS:
+        return None
+    if host not in _limiters:
+        _limiters[host] = RateLimiter(HOST_RATE_LIMITS[host])
+    return _limiters[host]
+
+
+def shared_client():
+    """
+    The process-wide pooled httpx.AsyncClient.
+
+    An AsyncClient is bound to the event loop it first runs on, so a new one is created
+    when called from a different loop (e.g. a second asyncio.run()).
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        if _client_loop is not loop:
+            # Rate limiter locks are bound to a loop as well
+            _limiters.clear()
+        _client = httpx.AsyncClient(limits=POOL_LIMITS, timeout=DEFAULT_TIMEOUT, follow_redirects=True)
+        _client_loop = loop
+    return _client
+
+
+async def close_shared_client():
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+def _retry_delay(response, attempt, backoff):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return backoff * (2 ** attempt)
+
+
+async def get_json(url, params=None, headers=None, client=None, retries=2, backoff=0.5, cache=None, transform=None,
+                   cache_key=None):
+    """
+    GET `url` and return (status_code, parsed JSON or None for non-200 responses).
+
+    Requests to hosts in HOST_RATE_LIMITS wait for their host's token bucket. Throttled
+    (429), 5xx and connection errors are retried up to `retries` times with exponential
+    backoff, honouring Retry-After.
+
+    With an HTTPCache (data/http_cache.py) the request is conditional and a 304 is served
+    from the cached body, reported as status 200. `transform` is applied to the parsed JSON
+    (e.g. normalization to StandardizedEvents) and its result is reused for as long as
+    the body is unchanged. `cache_key` overrides the key derived from url and params, e.g.
+    to key a cursor walk by page number.
+    """
+    client = client or shared_client()
+    limiter = rate_limiter(urlsplit(url).hostname)
+    key = (cache_key or cache.key(url, params)) if cache is not None else None
+    if cache is not None:
+        headers = {**(headers or {}), **cache.conditional_headers(key)}
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            await limiter.acquire()
+        try:
+            response = await client.get(url, params=params, headers=headers)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(_retry_delay(None, attempt, backoff))
+            continue
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            await asyncio.sleep(_retry_delay(response, attempt, backoff))
+            continue
+        break
+
+    if cache is not None and response.status_code == 304:
+        body_hash = cache.not_modified(key)
+        return 200, cache.result(key, body_hash, lambda body: _parse(body, transform))
+    if response.status_code != 200:
+        return response.status_code, None
+    if cache is None:
+        data = response.json()
+        return 200, transform(data) if transform is not None else data
+    body = response.content
+    body_hash, _ = cache.store(key, url, body, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return 200, cache.result(key, body_hash, lambda body: _parse(body, transform), body)
+
+
+def _parse(body, transform):
+    data = json.loads(body)
+    return transform(data) if transform is not None else data
@@ -1,19 +1,24 @@
+import asyncio
 import requests
 import json
 import os
 from dotenv import load_dotenv
 from .event_models import StandardizedEvent
+from .http_client import get_json
+from .http_cache import default_http_cache
 from datetime import datetime, timedelta
 import math
 
 class KalshiClient:
-    def __init__(self):
+    def __init__(self, http_cache=None):
         self.api_url = "https://trading-api.kalshi.com/trade-api/v2/events"
         self.params = {"limit": 200, "status": "open", "with_nested_markets": "true"}
         self.headers = {'Accept': 'application/json'}
         self.session = requests.Session()
         self.session.headers.update(self.headers)
         self.token = None  # To store the authentication token
+        # Conditional-request cache for the async fetch path; set to None to always download
+        self.http_cache = http_cache or default_http_cache()
 
     def login(self, email, password):
         response = requests.post(
@@ -28,22 +33,93 @@ class KalshiClient:
         else:
             raise Exception(f"Failed to login to Kalshi: {response.status_code} - {response.text}")
 
-    def fetch_markets(self):
-        all_data = []
-        next_cursor = None
+    def _page_params(self):
+        # Each walk starts from a fresh copy so the cursor never leaks into self.params
+        params = dict(self.params)
+        params.pop("cursor", None)
+        return params
+
+    def _auth_headers(self):
+        headers = dict(self.headers)
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    def iter_market_pages(self):
+        """
+        Yield the StandardizedEvents of each page of open events as soon as it arrives.
+
+        Only one page of raw events is held at a time, so consumers can start writing or
+        embedding while later pages are still to be fetched. A failed page raises, so a
+        truncated listing is never mistaken for the full one (delta sync would mark every
+        market after it as closed).
+        """
+        params = self._page_params()
         while True:
-            if next_cursor:
-                self.params["cursor"] = next_cursor
-            response = self.session.get(self.api_url, params=self.params)
+            response = self.session.get(self.api_url, params=params)
             if response.status_code != 200:
-                print(f"Error fetching data from Kalshi: {response.status_code}")
-                break
+                raise RuntimeError(f"Error fetching data from Kalshi: {response.status_code}")
             data = response.json()
-            all_data.extend(data.get("events", []))
+            yield self.process_markets_to_events(data.get("events", []))
             next_cursor = data.get('cursor', None)
             if not next_cursor:
-                break
-        return self.process_markets_to_events(all_data)
+                return
+            params["cursor"] = next_cursor
+
+    async def aiter_market_pages(self, client=None):
+        """
+        Async version of iter_market_pages over the shared connection pool.
+
+        The next page is requested before the current one is yielded, so its download
+        overlaps with whatever the consumer does with the current page. Unchanged pages
+        are answered from the HTTP cache without being normalized again; pages are cached
+        by position in the walk, since cursors are opaque and never repeat. Like
+        iter_market_pages, a page that still fails after get_json's retries raises.
+        """
+        params = self._page_params()
+        headers = self._auth_headers()
+        page_keys = []
+
+        def page_request():
+            cache_key = None
+            if self.http_cache is not None:
+                cache_key = self.http_cache.key(self.api_url, {**self._page_params(), "page": len(page_keys)})
+                page_keys.append(cache_key)
+            return asyncio.ensure_future(get_json(
+                self.api_url, params=dict(params), headers=headers, client=client,
+                cache=self.http_cache, transform=self._normalize_page, cache_key=cache_key
+            ))
+
+        request = page_request()
+        try:
+            while request is not None:
+                status, page = await request
+                request = None
+                if page is None:
+                    raise RuntimeError(f"Error fetching data from Kalshi: {status}")
+                events, next_cursor = page
+                if next_cursor:
+                    params["cursor"] = next_cursor
+                    request = page_request()
+                yield events
+            if self.http_cache is not None:
+                # The walk is complete: pages past its end belong to an older, longer listing
+                self.http_cache.retain(self.api_url, page_keys)
+        finally:
+            if request is not None:
+                request.cancel()
+
+    def _normalize_page(self, data):
+        return self.process_markets_to_events(data.get("events", [])), data.get('cursor', None)
+
+    def fetch_markets(self):
+        return [event for page in self.iter_market_pages() for event in page]
+
+    async def fetch_markets_async(self, client=None):
+        all_events = []
+        async for page in self.aiter_market_pages(client):
+            all_events.extend(page)
+        return all_events
 
     def process_markets_to_events(self, events):
         standardized_events = []
@@ -1,11 +1,19 @@
+import asyncio
 import json
 from .event_models import StandardizedEvent
 import requests
+from .http_client import get_json
+from .http_cache import default_http_cache
 
 class PolymarketAPI:
-    def __init__(self):
+    def __init__(self, http_cache=None):
         self.api_url = "https://gamma-api.polymarket.com/"
+        self.markets_url = f"{self.api_url}markets"
         self.headers = {'Accept': 'application/json'}
+        self.page_size = 500  # markets per page request
+        self.workers = 4  # page requests in flight at once
+        # Conditional-request cache for the async fetch path; set to None to always download
+        self.http_cache = http_cache or default_http_cache()
 
     def process_markets_to_events(self, markets):
         standardized_events = []
@@ -44,14 +52,110 @@ class PolymarketAPI:
         return standardized_events
 
     def fetch_markets(self):
-        url = f"{self.api_url}markets?active=true&closed=false"
+        # Sequential fallback over one keep-alive session; fetch_markets_async fans out pages
+        all_events = []
+        seen = set()
+        offset = 0
         try:
-            response = requests.get(url, headers=self.headers)
-            if response.status_code != 200:
-                print(f"Error fetching data from Polymarket: {response.status_code}")
-                return []
-            data = response.json()
-            return self.process_markets_to_events(data)
+            with requests.Session() as session:
+                session.headers.update(self.headers)
+                while True:
+                    response = session.get(self.markets_url, params=self._page_params(offset))
+                    if response.status_code != 200:
+                        print(f"Error fetching data from Polymarket: {response.status_code}")
+                        return []
+                    page = response.json()
+                    all_events.extend(self._unseen(self.process_markets_to_events(page), seen))
+                    if len(page) < self.page_size:
+                        return all_events
+                    offset += self.page_size
+        except Exception as e:
+            print(f"Failed to fetch data from Polymarket: {e}")
+            return []
+
+    def _page_params(self, offset):
+        return {"active": "true", "closed": "false", "limit": self.page_size, "offset": offset}
+
+    @staticmethod
+    def _unseen(events, seen):
+        # Offset pages over a live listing can overlap when markets are added mid-walk
+        fresh = []
+        for event in events:
+            if event.market_id not in seen:
+                seen.add(event.market_id)
+                fresh.append(event)
+        return fresh
+
+    async def aiter_market_pages(self, client=None):
+        """
+        Yield the StandardizedEvents of every page of open markets, in completion order.
+
+        `workers` page requests run at once over the shared keep-alive pool, each claiming the
+        next offset; the first short page marks the end of the listing. Requests go through the
+        per-host rate limiter and retry with backoff, and a page that still fails raises so a
+        truncated catalogue is never mistaken for the full one.
+        """
+        # Bounded, so workers wait for the consumer instead of buffering the whole listing
+        pages = asyncio.Queue(maxsize=self.workers)
+        state = {"next_offset": 0, "end": None}
+        page_keys = []
+
+        async def worker():
+            while True:
+                offset = state["next_offset"]
+                if state["end"] is not None and offset >= state["end"]:
+                    return
+                state["next_offset"] += self.page_size
+                if self.http_cache is not None:
+                    page_keys.append(self.http_cache.key(self.markets_url, self._page_params(offset)))
+                # Pages are normalized once per distinct body; a 304 reuses the cached events
+                status, page = await get_json(self.markets_url, params=self._page_params(offset),
+                                              headers=self.headers, client=client,
+                                              cache=self.http_cache, transform=self.process_markets_to_events)
+                if page is None:
+                    raise RuntimeError(f"Polymarket page at offset {offset} failed with status {status}")
+                if len(page) < self.page_size:
+                    end = offset + len(page)
+                    state["end"] = end if state["end"] is None else min(state["end"], end)
+                if page:
+                    await pages.put(page)
+
+        async def run_workers():
+            tasks = [asyncio.ensure_future(worker()) for _ in range(self.workers)]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # A failed page (or a consumer that stopped) makes the queued pages moot; drop
+                # them so the end marker fits without waiting
+                for task in tasks:
+                    task.cancel()
+                while not pages.empty():
+                    pages.get_nowait()
+                pages.put_nowait(None)
+                raise
+            await pages.put(None)
+
+        runner = asyncio.ensure_future(run_workers())
+        seen = set()
+        try:
+            while True:
+                page = await pages.get()
+                if page is None:
+                    break
+                yield self._unseen(page, seen)
+            await runner  # re-raises a failed page
+            if self.http_cache is not None:
+                # Offsets past the end of a listing that shrank are never requested again
+                self.http_cache.retain(self.markets_url, page_keys)
+        finally:
+            runner.cancel()
+
+    async def fetch_markets_async(self, client=None):
+        try:
+            all_events = []
+            async for events in self.aiter_market_pages(client):
+                all_events.extend(events)
+            return all_events
         except Exception as e:
             print(f"Failed to fetch data from Polymarket: {e}")
             return []
@@ -1,10 +1,14 @@
 import requests
 from .event_models import StandardizedEvent
+from .http_client import get_json
+from .http_cache import default_http_cache
 
 class PredictItAPI:
-    def __init__(self):
+    def __init__(self, http_cache=None):
         self.api_url = "https://www.predictit.org/api/marketdata/all/"
         self.headers = {'Accept': 'application/json'}
+        # Conditional-request cache for the async fetch path; set to None to always download
+        self.http_cache = http_cache or default_http_cache()
 
     def process_markets_to_events(self, markets):
         standardized_events = []
@@ -47,4 +51,20 @@ class PredictItAPI:
             print(f"Failed to fetch data from PredictIt: {e}")
             return []
 
+    async def fetch_markets_async(self, client=None):
+        try:
+            # A 304 or an identical body reuses the events normalized from the cached payload
+            status, events = await get_json(
+                self.api_url, headers=self.headers, client=client, cache=self.http_cache,
+                transform=lambda data: self.process_markets_to_events(data.get('markets', []))
+            )
+            print(f"Fetching data from PredictIt: {self.api_url}, Status Code: {status}")
+            if events is None:
+                print(f"Error fetching data from PredictIt: {status}")
+                return []
+            return events
+        except Exception as e:
+            print(f"Failed to fetch data from PredictIt: {e}")
+            return []
+
 # Remove the standalone execution block
@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import re
+from datetime import datetime, timezone
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .event_models import EventTable, StandardizedEvent
+
+# Column layout of a market snapshot; market ids are stored as strings since venues mix
+# string tickers with PredictIt's integer contract ids
+SNAPSHOT_SCHEMA = pa.schema([
+    ("source", pa.string()),
+    ("market_id", pa.string()),
+    ("status", pa.string()),
+    ("headline", pa.string()),
+    ("description", pa.string()),
+    ("end_date", pa.string()),
+    ("yes_ask", pa.float64()),
+    ("no_ask", pa.float64()),
+    ("liquidity", pa.float64()),
+])
+FLOAT_COLUMNS = ("yes_ask", "no_ask", "liquidity")
+LATEST_MARKER = "_LATEST"
+# Completed snapshots kept by default; readers that opened the previous manifest can still finish
+DEFAULT_KEEP = 3
+
+
+def _row(event):
+    if isinstance(event, StandardizedEvent):
+        event = event.to_dict()
+    row = {name: event.get(name) for name in SNAPSHOT_SCHEMA.names}
+    if row["market_id"] is not None:
+        row["market_id"] = str(row["market_id"])
+    for name in FLOAT_COLUMNS:
+        try:
+            row[name] = float(row[name]) if row[name] is not None else None
+        except (TypeError, ValueError):
+            row[name] = None
+    for name in ("source", "status", "headline", "description", "end_date"):
+        if row[name] is not None and not isinstance(row[name], str):
+            row[name] = str(row[name])
+    return row
+
+
+def _partition_name(source):
+    return re.sub(r'[^\w.-]', '_', source or 'unknown')
+
+
+class SnapshotWriter:
+    """
+    Streaming writer of one catalogue snapshot in Parquet.
+
+    Files are partitioned by source and snapshot date:
+        <root>/source=<Source>/date=<YYYY-MM-DD>/<snapshot_id>.parquet
+    Events can be written in any number of calls (e.g. one per fetched page); each call
+    becomes a row group, so memory stays bounded by the batch being written. Files are
+    written under a temporary name and the `_LATEST` marker is only moved once every
+    partition is complete, so readers never observe a half-written snapshot. After that,
+    all but the newest `keep` snapshots are deleted (keep=None keeps every snapshot).
+    """
+
+    def __init__(self, root, snapshot_id=None, compression='zstd', keep=DEFAULT_KEEP):
+        now = datetime.now(timezone.utc)
+        self.root = root
+        self.snapshot_id = snapshot_id or now.strftime('%Y%m%dT%H%M%S%fZ')
+        self.date = now.strftime('%Y-%m-%d')
+        self.compression = compression
+        self.keep = keep
+        self.writers = {}
+        self.paths = {}
+        self.source_rows = {}
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _writer(self, source):
+        if source not in self.writers:
+            directory = os.path.join(self.root, f"source={_partition_name(source)}", f"date={self.date}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{self.snapshot_id}.parquet")
+            self.paths[source] = path
+            self.writers[source] = pq.ParquetWriter(path + '.tmp', SNAPSHOT_SCHEMA, compression=self.compression)
+        return self.writers[source]
+
+    def write(self, events):
+        if isinstance(events, EventTable):
+            self._write_table(events)
+            return
+        by_source = {}
+        for event in events:
+            row = _row(event)
+            by_source.setdefault(row["source"], []).append(row)
+        for source, rows in by_source.items():
+            self._writer(source).write_batch(pa.RecordBatch.from_pylist(rows, schema=SNAPSHOT_SCHEMA))
+            self._count(source, len(rows))
+
+    def _write_table(self, table):
+        # Straight from the typed columns, no per-row dicts
+        sources = table.column('source')
+        for source in dict.fromkeys(sources):
+            rows = np.flatnonzero(sources == source)
+            arrays = []
+            for field in SNAPSHOT_SCHEMA:
+                values = table.column(field.name)[rows]
+                if field.name in FLOAT_COLUMNS:
+                    arrays.append(pa.array(values, type=field.type, from_pandas=True))
+                else:
+                    arrays.append(pa.array([str(v) if v is not None else None for v in values], type=field.type))
+            self._writer(source).write_batch(pa.RecordBatch.from_arrays(arrays, schema=SNAPSHOT_SCHEMA))
+            self._count(source, len(rows))
+
+    def _count(self, source, rows):
+        self.source_rows[source] = self.source_rows.get(source, 0) + rows
+        self.rows += rows
+
+    def close(self):
+        for source, writer in self.writers.items():
+            writer.close()
+            os.replace(self.paths[source] + '.tmp', self.paths[source])
+        manifest = {
+            "snapshot_id": self.snapshot_id,
+            "files": sorted(os.path.relpath(path, self.root) for path in self.paths.values()),
+            "rows": self.rows,
+        }
+        os.makedirs(self.root, exist_ok=True)
+        marker = os.path.join(self.root, LATEST_MARKER)
+        with open(marker + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(manifest, file)
+        os.replace(marker + '.tmp', marker)
+        self.writers = {}
+        if self.keep is not None:
+            prune_snapshots(self.root, self.keep, current=self.snapshot_id)
+        return manifest
+
+    def discard(self, source):
+        """Drop everything written for `source` so far, e.g. when its venue failed mid-walk."""
+        writer = self.writers.pop(source, None)
+        if writer is not None:
+            writer.close()
+            os.remove(self.paths.pop(source) + '.tmp')
+            self.rows -= self.source_rows.pop(source, 0)
+        return writer is not None
+
+    def abort(self):
+        for source, writer in self.writers.items():
+            writer.close()
+            os.remove(self.paths[source] + '.tmp')
+        self.writers = {}
+
+
+def prune_snapshots(root, keep=DEFAULT_KEEP, current=None):
+    """
+    Delete the files of all but the `keep` most recently written snapshots under `root`
+    (never `current`), and the partition directories left empty. Returns the removed ids.
+    """
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith('.parquet'):
+                files.setdefault(name[:-len('.parquet')], []).append(os.path.join(directory, name))
+    written = {snapshot_id: max(os.path.getmtime(path) for path in paths) for snapshot_id, paths in files.items()}
+    newest = sorted(written, key=lambda snapshot_id: (snapshot_id == current, written[snapshot_id]), reverse=True)
+    removed = newest[max(1, keep):]
+    for snapshot_id in removed:
+        for path in files[snapshot_id]:
+            os.remove(path)
+    for directory, subdirectories, names in os.walk(root, topdown=False):
+        if directory != root and not subdirectories and not names:
+            os.rmdir(directory)
+    return removed
+
+
+def latest_snapshot(root):
+    """Manifest of the last completed snapshot under `root`, or None if there is none."""
+    marker = os.path.join(root, LATEST_MARKER)
+    if not os.path.exists(marker):
+        return None
+    with open(marker, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def read_snapshot(root, columns=None, sources=None):
+    """
+    Latest snapshot as a pyarrow Table, reading only `columns` (default all) of the
+    partitions of `sources` (default all). Returns None when no snapshot exists.
+    """
+    manifest = latest_snapshot(root)
+    if manifest is None:
+        return None
+    wanted = {_partition_name(source) for source in sources} if sources else None
+    tables = []
+    for relpath in manifest["files"]:
+        partition = relpath.split(os.sep)[0].split('=', 1)[1]
+        if wanted is None or partition in wanted:
+            tables.append(pq.read_table(os.path.join(root, relpath), columns=columns))
+    if not tables:
+        schema = SNAPSHOT_SCHEMA if columns is None else pa.schema([SNAPSHOT_SCHEMA.field(c) for c in columns])
+        return schema.empty_table()
+    return pa.concat_tables(tables)
+
+
+def load_events(root, columns=None, sources=None):
+    """Latest snapshot as a list of event dicts (the shape AllMarketsEvents.json had), or None."""
+    table = read_snapshot(root, columns, sources)
+    return table.to_pylist() if table is not None else None
+
+
+def load_table(root, columns=None, sources=None):
+    """Latest snapshot as an EventTable, built column by column without per-row dicts, or None."""
+    table = read_snapshot(root, columns, sources)
+    if table is None:
+        return None
+    return EventTable.from_columns({
+        name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names
+    })
+
+
+def convert_json(json_path, root, batch_size=10000):
+    """Write an existing AllMarketsEvents.json as a new snapshot under `root`."""
+    with open(json_path, 'r', encoding='utf-8') as file:
+        events = json.load(file)
+    with SnapshotWriter(root) as writer:
+        for start in range(0, len(events), batch_size):
+            writer.write(events[start:start + batch_size])
+    print(f"Converted {len(events)} events from {json_path} to snapshot {writer.snapshot_id} in {root}")
+    return writer.snapshot_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a JSON market catalogue to a Parquet snapshot.")
+    parser.add_argument("json_path", help="e.g. storage/AllMarketsEvents.json")
+    parser.add_argument("--root", help="Snapshot directory (default: 'snapshots' next to the JSON file).")
+    args = parser.parse_args()
+    root = args.root or os.path.join(os.path.dirname(os.path.abspath(args.json_path)), 'snapshots')
+    convert_json(args.json_path, root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+import hashlib
+import os
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # HNSW is optional, IVF and brute force only need NumPy
+    hnswlib = None
+
+
+def normalize_rows(vectors):
+    """Return a float32 copy of `vectors` with every row scaled to unit length."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def fingerprint_ids(ids):
+    """Stable fingerprint of the row order an index was built over."""
+    digest = hashlib.sha1()
+    for item_id in ids:
+        digest.update(str(item_id).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def top_k(scores, k):
+    """
+    Vectorized top-k over the last axis of a 2-D score matrix.
+
+    Returns (scores, ids) sorted by descending score, padded with -inf / -1
+    when a row has fewer than k columns.
+    """
+    scores = np.atleast_2d(scores)
+    n_rows, n_cols = scores.shape
+    k_eff = min(k, n_cols)
+    if k_eff == 0:
+        return np.full((n_rows, k), -np.inf, dtype=np.float32), np.full((n_rows, k), -1, dtype=np.int64)
+    if k_eff < n_cols:
+        part = np.argpartition(-scores, k_eff - 1, axis=1)[:, :k_eff]
+    else:
+        part = np.broadcast_to(np.arange(n_cols), (n_rows, n_cols))
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    ids = np.take_along_axis(part, order, axis=1).astype(np.int64)
+    out_scores = np.take_along_axis(part_scores, order, axis=1).astype(np.float32)
+    if k_eff < k:
+        out_scores = np.pad(out_scores, ((0, 0), (0, k - k_eff)), constant_values=-np.inf)
+        ids = np.pad(ids, ((0, 0), (0, k - k_eff)), constant_values=-1)
+    return out_scores, ids
+
+
+def inverse_norms(vectors, rows=None, chunk_size=4096):
+    """float32 1/||v|| for `rows` of `vectors` (default all), read chunk by chunk; 0 for zero rows."""
+    n = len(vectors) if rows is None else len(rows)
+    inv = np.empty(n, dtype=np.float32)
+    for start in range(0, n, chunk_size):
+        chunk = vectors[start:start + chunk_size] if rows is None else vectors[rows[start:start + chunk_size]]
+        norms = np.linalg.norm(np.asarray(chunk, dtype=np.float32), axis=1)
+        inv[start:start + chunk_size] = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return inv
+
+
+class VectorIndex:
+    """
+    Base class for the market embedding indexes.
+
+    An index references the caller's embedding matrix (typically the memory-mapped vector
+    store) instead of copying it, and covers the row numbers in `rows`. Cosine scores are
+    the raw inner products times the cached inverse row norms, computed a chunk at a time,
+    so nothing the size of the catalogue is ever materialized in RAM. `search_exact` can
+    always fall back to a brute-force scan with exact results.
+
+    `save` writes only the index structure (norms, centroids, lists); `load_index` needs
+    the same matrix again. SEARCH_PARAMS can be changed on a built or loaded index with
+    `configure`; BUILD_PARAMS require a rebuild. `update` adds and removes rows in place,
+    e.g. after the vector store grew, without re-training.
+    """
+    kind = None
+    BUILD_PARAMS = ()
+    SEARCH_PARAMS = ()
+
+    def __init__(self):
+        self.vectors = None
+        self.rows = None
+        self.inv_norms = None
+        self.fingerprint = None
+
+    def __len__(self):
+        return 0 if self.rows is None else len(self.rows)
+
+    def build(self, vectors, ids=None, rows=None):
+        """Index `rows` of `vectors` (default every row); search results are row numbers of `vectors`."""
+        self.vectors = vectors
+        self.rows = np.arange(len(vectors), dtype=np.int64) if rows is None else np.asarray(rows, dtype=np.int64)
+        self.inv_norms = np.zeros(len(vectors), dtype=np.float32)
+        self.inv_norms[self.rows] = inverse_norms(vectors, self.rows)
+        self.fingerprint = fingerprint_ids(ids) if ids is not None else None
+        self._build()
+        return self
+
+    def _build(self):
+        pass
+
+    def update(self, vectors, add_rows=(), remove_rows=(), ids=None):
+        """
+        Cover `add_rows` and stop covering `remove_rows` of `vectors`, which may have grown
+        since the index was built (it replaces the referenced matrix). `ids` are the new
+        fingerprint ids, as passed to `build`.
+        """
+        add_rows = np.asarray(add_rows, dtype=np.int64)
+        remove_rows = np.asarray(remove_rows, dtype=np.int64)
+        self.vectors = vectors
+        if len(self.inv_norms) < len(vectors):
+            self.inv_norms = np.concatenate([self.inv_norms, np.zeros(len(vectors) - len(self.inv_norms), dtype=np.float32)])
+        self.inv_norms[remove_rows] = 0.0
+        self.inv_norms[add_rows] = inverse_norms(vectors, add_rows)
+        self.rows = np.union1d(np.setdiff1d(self.rows, remove_rows), add_rows).astype(np.int64)
+        if ids is not None:
+            self.fingerprint = fingerprint_ids(ids)
+        self._update(add_rows, remove_rows)
+        return self
+
+    def _update(self, add_rows, remove_rows):
+        pass
+
+    def attach(self, vectors):
+        """Point a loaded index at its embedding matrix again."""
+        if len(vectors) < len(self.inv_norms):
+            raise ValueError(f"Index covers {len(self.inv_norms)} rows, got a matrix of {len(vectors)}.")
+        self.vectors = vectors
+        return self
+
+    def params(self):
+        return {name: getattr(self, name) for name in self.BUILD_PARAMS + self.SEARCH_PARAMS}
+
+    def configure(self, **params):
+        """
+        Apply search-time params; returns False if a build-time param differs from the
+        value the index was built with (None means "let the index choose" and matches).
+        """
+        for name, value in params.items():
+            if name in self.SEARCH_PARAMS:
+                setattr(self, name, value)
+            elif name not in self.BUILD_PARAMS:
+                raise TypeError(f"Unknown parameter '{name}' for a '{self.kind}' index.")
+            elif value is not None and value != getattr(self, name):
+                return False
+        return True
+
+    def _scores(self, queries, rows, chunk_size=4096):
+        """Cosine scores of normalized `queries` against `rows`, reading the matrix one chunk at a time."""
+        scores = np.empty((len(queries), len(rows)), dtype=np.float32)
+        contiguous = len(rows) and rows[-1] - rows[0] == len(rows) - 1 and (np.diff(rows) == 1).all()
+        for start in range(0, len(rows), chunk_size):
+            part = rows[start:start + chunk_size]
+            # A contiguous run is sliced as a view of the memory map instead of gathered
+            chunk = self.vectors[part[0]:part[-1] + 1] if contiguous else self.vectors[part]
+            scores[:, start:start + chunk_size] = (queries @ np.asarray(chunk, dtype=np.float32).T) * self.inv_norms[part]
+        return scores
+
+    def search_exact(self, queries, k):
+        return self.search_subset(queries, k, self.rows)
+
+    def search(self, queries, k):
+        return self.search_exact(queries, k)
+
+    def search_subset(self, queries, k, rows):
+        """Exact search restricted to `rows` (e.g. a metadata prefilter); ids are row numbers."""
+        queries = normalize_rows(np.atleast_2d(queries))
+        rows = np.asarray(rows, dtype=np.int64)
+        scores, local = top_k(self._scores(queries, rows), k)
+        ids = np.full_like(local, -1)
+        ids[local >= 0] = rows[local[local >= 0]]
+        return scores, ids
+
+    def _state(self):
+        return {}
+
+    def _load_state(self, state):
+        pass
+
+    def save(self, path):
+        np.savez(
+            path,
+            kind=np.array(self.kind),
+            fingerprint=np.array(self.fingerprint or ''),
+            rows=self.rows,
+            inv_norms=self.inv_norms,
+            **self._state()
+        )
+
+    @classmethod
+    def from_state(cls, state, path):
+        index = cls()
+        index.rows = state['rows']
+        index.inv_norms = state['inv_norms']
+        index.fingerprint = str(state['fingerprint']) or None
+        index._load_state(state)
+        return index
+
+
+class BruteForceIndex(VectorIndex):
+    """Exact inner-product scan over every stored vector."""
+    kind = 'flat'
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file index: vectors are clustered with spherical k-means and a query
+    only scans the `n_probe` lists whose centroids are closest to it.
+
+    Raising `n_probe` trades latency for recall; `n_probe >= n_lists` is exact.
+    """
+    kind = 'ivf'
+
+    BUILD_PARAMS = ('n_lists', 'n_iter', 'seed')
+    SEARCH_PARAMS = ('n_probe',)
+
+    def __init__(self, n_lists=None, n_probe=8, n_iter=10, seed=0):
+        super().__init__()
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids = None
+        self.list_ids = None
+        self.list_offsets = None
+        self.trained_size = 0
+
+    def _build(self):
+        n = len(self.rows)
+        self.trained_size = n
+        if n == 0:
+            # Empty catalogue: no lists, every search returns no hits
+            self.centroids = np.empty((0, self.vectors.shape[1] if self.vectors.ndim == 2 else 0), dtype=np.float32)
+            self.list_ids = np.empty(0, dtype=np.int64)
+            self.list_offsets = np.zeros(1, dtype=np.int64)
+            return
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        n_lists = max(1, min(n_lists, n))
+        rng = np.random.default_rng(self.seed)
+
+        # Train on a sample; 64 points per list is plenty for coarse quantization
+        sample_size = min(n, n_lists * 64)
+        sample_rows = np.sort(self.rows[rng.choice(n, sample_size, replace=False)])
+        sample = normalize_rows(self.vectors[sample_rows])
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+                else:
+                    # Reseed empty lists so every centroid stays useful
+                    centroids[c] = sample[rng.integers(sample_size)]
+            centroids = normalize_rows(centroids)
+
+        self.centroids = centroids
+        self.n_lists = n_lists
+        self._set_lists(self.rows, self._assign(self.rows))
+
+    def _update(self, add_rows, remove_rows):
+        # New rows join the list of their nearest centroid; k-means is only re-run once the
+        # index has doubled since training, when the centroids may no longer fit the data
+        if not len(self.centroids) or len(self.rows) > 2 * self.trained_size:
+            self._build()
+            return
+        assign = np.repeat(np.arange(len(self.centroids), dtype=np.int64), np.diff(self.list_offsets))
+        keep = ~np.isin(self.list_ids, remove_rows)
+        self._set_lists(np.concatenate([self.list_ids[keep], add_rows]),
+                        np.concatenate([assign[keep], self._assign(add_rows)]))
+
+    def _set_lists(self, rows, assign):
+        order = np.argsort(assign, kind='stable')
+        self.list_ids = rows[order].astype(np.int64)
+        self.list_offsets = np.searchsorted(assign[order], np.arange(len(self.centroids) + 1)).astype(np.int64)
+
+    def _assign(self, rows, chunk_size=4096):
+        # Nearest centroid by inner product; row norms don't change the argmax
+        assign = np.empty(len(rows), dtype=np.int64)
+        for start in range(0, len(rows), chunk_size):
+            chunk = np.asarray(self.vectors[rows[start:start + chunk_size]], dtype=np.float32)
+            assign[start:start + chunk_size] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assign
+
+    def search(self, queries, k, n_probe=None):
+        queries = normalize_rows(np.atleast_2d(queries))
+        n_lists = len(self.centroids)
+        n_probe = min(n_probe or self.n_probe, n_lists)
+        if n_probe >= n_lists:
+            return self.search_subset(queries, k, self.rows)
+
+        probe_lists = top_k(queries @ self.centroids.T, n_probe)[1]
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, lists in enumerate(probe_lists):
+            candidates = np.sort(np.concatenate([
+                self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]] for c in lists
+            ]))
+            if not len(candidates):
+                continue
+            scores, local = top_k(self._scores(queries[row:row + 1], candidates), k)
+            valid = local[0] >= 0
+            all_scores[row, valid] = scores[0, valid]
+            all_ids[row, valid] = candidates[local[0, valid]]
+        return all_scores, all_ids
+
+    def _state(self):
+        return {
+            'centroids': self.centroids,
+            'list_ids': self.list_ids,
+            'list_offsets': self.list_offsets,
+            'params': np.array([self.n_lists or 0, self.n_probe, self.n_iter, self.seed]),
+            'trained_size': np.array(self.trained_size),
+        }
+
+    def _load_state(self, state):
+        self.centroids = state['centroids']
+        self.list_ids = state['list_ids']
+        self.list_offsets = state['list_offsets']
+        self.trained_size = int(state.get('trained_size', len(state['rows'])))
+        self.n_lists, self.n_probe, self.n_iter, self.seed = (int(v) for v in state['params'])
+
+
+class HNSWIndex(VectorIndex):
+    """
+    Graph index backed by hnswlib (optional dependency).
+
+    `ef_search` is the recall/latency knob: larger values visit more of the graph.
+    """
+    kind = 'hnsw'
+
+    BUILD_PARAMS = ('M', 'ef_construction')
+    SEARCH_PARAMS = ('ef_search',)
+
+    def __init__(self, M=16, ef_construction=200, ef_search=64):
+        if hnswlib is None:
+            raise ImportError("hnswlib is required for the 'hnsw' index type (pip install hnswlib).")
+        super().__init__()
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.graph = None
+
+    def _build(self, chunk_size=4096):
+        # hnswlib keeps its own copy of the vectors inside the graph; they are added a chunk at a time
+        self.graph = hnswlib.Index(space='ip', dim=self.vectors.shape[1])
+        self.graph.init_index(max_elements=max(1, len(self.rows)), ef_construction=self.ef_construction, M=self.M)
+        for start in range(0, len(self.rows), chunk_size):
+            rows = self.rows[start:start + chunk_size]
+            chunk = np.asarray(self.vectors[rows], dtype=np.float32) * self.inv_norms[rows][:, None]
+            self.graph.add_items(chunk, rows)
+        self.graph.set_ef(self.ef_search)
+
+    def _update(self, add_rows, remove_rows, chunk_size=4096):
+        # Removed rows are only marked deleted; re-adding a deleted label un-marks it
+        for row in remove_rows:
+            self.graph.mark_deleted(int(row))
+        needed = self.graph.get_current_count() + len(add_rows)
+        if needed > self.graph.get_max_elements():
+            self.graph.resize_index(max(needed, 2 * self.graph.get_max_elements()))
+        for start in range(0, len(add_rows), chunk_size):
+            rows = add_rows[start:start + chunk_size]
+            chunk = np.asarray(self.vectors[rows], dtype=np.float32) * self.inv_norms[rows][:, None]
+            self.graph.add_items(chunk, rows)
+
+    def search(self, queries, k, ef_search=None):
+        queries = normalize_rows(np.atleast_2d(queries))
+        k_eff = min(k, len(self.rows))
+        if k_eff == 0:
+            return top_k(np.empty((len(queries), 0), dtype=np.float32), k)
+        self.graph.set_ef(max(ef_search or self.ef_search, k_eff))
+        labels, distances = self.graph.knn_query(queries, k=k_eff)
+        scores = (1.0 - distances).astype(np.float32)
+        ids = labels.astype(np.int64)
+        if k_eff < k:
+            scores = np.pad(scores, ((0, 0), (0, k - k_eff)), constant_values=-np.inf)
+            ids = np.pad(ids, ((0, 0), (0, k - k_eff)), constant_values=-1)
+        return scores, ids
+
+    def save(self, path):
+        super().save(path)
+        self.graph.save_index(_hnsw_graph_path(path))
+
+    def _state(self):
+        return {'params': np.array([self.M, self.ef_construction, self.ef_search])}
+
+    def _load_state(self, state):
+        self.M, self.ef_construction, self.ef_search = (int(v) for v in state['params'])
+
+    def attach(self, vectors):
+        super().attach(vectors)
+        if self.graph is None:
+            self.graph = hnswlib.Index(space='ip', dim=vectors.shape[1])
+            self.graph.load_index(self._graph_path, max_elements=max(1, len(self.rows)))
+            self.graph.set_ef(self.ef_search)
+        return self
+
+    @classmethod
+    def from_state(cls, state, path):
+        index = super().from_state(state, path)
+        index._graph_path = _hnsw_graph_path(path)
+        return index
+
+
+def _hnsw_graph_path(path):
+    return os.path.splitext(path)[0] + '.hnsw'
+
+
+INDEX_TYPES = {cls.kind: cls for cls in (BruteForceIndex, IVFIndex, HNSWIndex)}
+
+
+def create_index(kind='ivf', **params):
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}'. Expected one of {sorted(INDEX_TYPES)}.")
+    return INDEX_TYPES[kind](**params)
+
+
+def load_index(path, vectors):
+    """Load an index saved with `save` and attach it to the embedding matrix it was built over."""
+    with np.load(path, allow_pickle=False) as state:
+        state = dict(state)
+    kind = str(state['kind'])
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}' in {path}.")
+    return INDEX_TYPES[kind].from_state(state, path).attach(vectors)
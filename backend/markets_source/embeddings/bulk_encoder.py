@@ -0,0 +1,91 @@
+import asyncio
+import time
+import numpy as np
+
+
+class BulkEncoder:
+    """
+    Bulk embedding scheduler for catalogue refreshes.
+
+    Texts are sorted by token length and grouped so every batch stays under a padded token
+    budget (batch size x longest text), which keeps short headlines from paying for the
+    padding of long ones. Up to `max_in_flight` batches run on the executor at once and
+    finished batches are yielded as soon as they complete, so callers can stream vectors
+    to the cache and vector store while later batches are still encoding.
+    """
+
+    def __init__(self, model, executor, token_budget=8192, max_batch_size=64, max_in_flight=4):
+        self.model = model
+        self.executor = executor
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.max_in_flight = max_in_flight
+        self.stats = {}
+
+    def token_lengths(self, texts):
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        if tokenizer is not None:
+            try:
+                return [len(ids) for ids in tokenizer(list(texts), add_special_tokens=True)['input_ids']]
+            except Exception as e:
+                print(f"Tokenizer length estimate failed, falling back to word counts: {e}")
+        # Rough estimate: headline tokens are ~1.3x whitespace-separated words
+        return [int(len(text.split()) * 1.3) + 2 for text in texts]
+
+    def plan_batches(self, texts):
+        """Split text positions into length-sorted batches that fit the padded token budget."""
+        lengths = self.token_lengths(texts)
+        order = np.argsort(lengths, kind='stable')
+        batches = []
+        batch = []
+        longest = 0
+        for position in order:
+            length = max(1, lengths[position])
+            padded = (len(batch) + 1) * max(longest, length)
+            if batch and (padded > self.token_budget or len(batch) >= self.max_batch_size):
+                batches.append(batch)
+                batch, longest = [], 0
+            batch.append(int(position))
+            longest = max(longest, length)
+        if batch:
+            batches.append(batch)
+        return batches, sum(lengths)
+
+    def _encode_batch(self, texts):
+        return self.model.encode(texts, batch_size=len(texts), normalize_embeddings=True)
+
+    async def encode(self, texts):
+        """Async generator of (positions, embeddings) in completion order."""
+        loop = asyncio.get_running_loop()
+        batches, total_tokens = self.plan_batches(texts)
+        pending = {}
+        next_batch = 0
+        done_texts = 0
+        start = time.perf_counter()
+
+        while next_batch < len(batches) or pending:
+            # Keep the executor saturated with up to max_in_flight batches
+            while next_batch < len(batches) and len(pending) < self.max_in_flight:
+                positions = batches[next_batch]
+                future = loop.run_in_executor(self.executor, self._encode_batch, [texts[p] for p in positions])
+                pending[future] = positions
+                next_batch += 1
+
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in finished:
+                positions = pending.pop(future)
+                embeddings = future.result()
+                done_texts += len(positions)
+                yield positions, embeddings
+
+        elapsed = time.perf_counter() - start
+        self.stats = {
+            'texts': done_texts,
+            'batches': len(batches),
+            'tokens': total_tokens,
+            'seconds': elapsed,
+            'texts_per_sec': done_texts / elapsed if elapsed > 0 else 0.0,
+        }
+        if done_texts:
+            print(f"Encoded {done_texts} texts in {len(batches)} batches: "
+                  f"{elapsed:.1f}s, {self.stats['texts_per_sec']:.1f} texts/sec")
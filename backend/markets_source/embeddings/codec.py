@@ -0,0 +1,50 @@
+import json
+import struct
+import numpy as np
+
+# Binary layout: 2-byte magic, format version, dtype code, dimension, then raw little-endian values
+MAGIC = b'EV'
+VERSION = 1
+HEADER = struct.Struct('<2sBBI')
+
+DTYPES = {
+    'float32': (0, np.dtype('<f4')),
+    'float16': (1, np.dtype('<f2')),
+}
+DTYPE_CODES = {code: dtype for code, dtype in DTYPES.values()}
+
+
+def encode_embedding(vector, dtype='float32'):
+    """Pack a 1-D embedding as header + little-endian float32 (or float16) bytes."""
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported embedding dtype '{dtype}'. Expected one of {sorted(DTYPES)}.")
+    code, np_dtype = DTYPES[dtype]
+    values = np.asarray(vector).ravel().astype(np_dtype, copy=False)
+    return HEADER.pack(MAGIC, VERSION, code, values.shape[0]) + values.tobytes()
+
+
+def is_legacy(buf):
+    """True for entries written by the old json.dumps(emb.tolist()) format."""
+    if isinstance(buf, str):
+        return True
+    return not buf.startswith(MAGIC)
+
+
+def _as_bytes(buf):
+    return buf.encode('utf-8') if isinstance(buf, str) else buf
+
+
+def decode_embedding(buf):
+    """
+    Decode a cached entry into a new float32 array.
+
+    Binary entries are read straight from the buffer with np.frombuffer; legacy
+    JSON entries are still accepted so old caches keep working.
+    """
+    buf = _as_bytes(buf)
+    if is_legacy(buf):
+        return np.asarray(json.loads(buf), dtype=np.float32)
+    magic, version, code, dim = HEADER.unpack_from(buf)
+    if version != VERSION or code not in DTYPE_CODES:
+        raise ValueError(f"Unsupported embedding encoding (version={version}, dtype code={code}).")
+    return np.frombuffer(buf, dtype=DTYPE_CODES[code], count=dim, offset=HEADER.size).astype(np.float32)
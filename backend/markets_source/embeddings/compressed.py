@@ -0,0 +1,171 @@
+import time
+import numpy as np
+from embeddings.ann_index import normalize_rows, top_k
+
+COMPRESSION_MODES = ('float16', 'int8', 'pca', 'truncate')
+
+
+class CompressedSearch:
+    """
+    Candidate generation over a compressed copy of the embedding matrix.
+
+    Modes:
+    - 'float16': half-precision copy (2x smaller than float32)
+    - 'int8':    per-dimension symmetric scalar quantization (4x smaller)
+    - 'pca':     projection onto the top `dim` principal components
+    - 'truncate': keep the first `dim` coordinates
+
+    `search` scores queries against the compressed codes, keeps `k * rescore_factor`
+    candidates and re-scores only those exactly against the full-precision vectors.
+    `build` can cover a subset of rows of a larger (e.g. memory-mapped) matrix; results are
+    always row numbers of that matrix.
+    """
+
+    def __init__(self, mode='int8', dim=512, rescore_factor=4, pca_sample_size=20000, seed=0):
+        if mode not in COMPRESSION_MODES:
+            raise ValueError(f"Unknown compression mode '{mode}'. Expected one of {COMPRESSION_MODES}.")
+        self.mode = mode
+        self.dim = dim
+        self.rescore_factor = rescore_factor
+        self.pca_sample_size = pca_sample_size
+        self.seed = seed
+        self.rows = None
+        self.codes = None
+        self.scale = None
+        self.mean = None
+        self.components = None
+
+    @staticmethod
+    def _chunks(vectors, rows, chunk_size):
+        # Normalized float32 chunks of `rows`, so only one chunk is ever copied
+        for start in range(0, len(rows), chunk_size):
+            yield normalize_rows(vectors[rows[start:start + chunk_size]])
+
+    def _encode(self, vectors, rows, chunk_size):
+        if self.mode == 'pca':
+            width = len(self.components)
+        elif self.mode == 'truncate':
+            width = min(self.dim, vectors.shape[1])
+        else:
+            width = vectors.shape[1]
+        codes = np.empty((len(rows), width), dtype={'float16': np.float16, 'int8': np.int8}.get(self.mode, np.float32))
+        start = 0
+        for chunk in self._chunks(vectors, rows, chunk_size):
+            if self.mode == 'int8':
+                chunk = np.clip(np.rint(chunk / self.scale), -127, 127)
+            elif self.mode == 'pca':
+                chunk = (chunk - self.mean) @ self.components.T
+            elif self.mode == 'truncate':
+                chunk = chunk[:, :width]
+            codes[start:start + len(chunk)] = chunk
+            start += len(chunk)
+        return codes
+
+    def build(self, vectors, rows=None, chunk_size=8192):
+        """Compress `rows` of `vectors` (default every row)."""
+        self.rows = np.arange(len(vectors), dtype=np.int64) if rows is None else np.asarray(rows, dtype=np.int64)
+        if self.mode == 'int8':
+            # Per-dimension scale over every covered row, then quantize
+            self.scale = np.zeros(vectors.shape[1], dtype=np.float32)
+            for chunk in self._chunks(vectors, self.rows, chunk_size):
+                np.maximum(self.scale, np.abs(chunk).max(axis=0), out=self.scale)
+            self.scale /= 127.0
+            self.scale[self.scale == 0] = 1.0
+        elif self.mode == 'pca':
+            rng = np.random.default_rng(self.seed)
+            sample_size = min(len(self.rows), self.pca_sample_size)
+            sample = normalize_rows(vectors[np.sort(self.rows[rng.choice(len(self.rows), sample_size, replace=False)])])
+            self.mean = sample.mean(axis=0)
+            _, _, vt = np.linalg.svd(sample - self.mean, full_matrices=False)
+            self.components = np.ascontiguousarray(vt[:self.dim])
+        self.codes = self._encode(vectors, self.rows, chunk_size)
+        return self
+
+    def update(self, vectors, add_rows=(), remove_rows=(), chunk_size=8192):
+        """
+        Drop `remove_rows` and compress `add_rows` of `vectors` (which may have grown since
+        `build`) with the scale or components fitted by `build`, without re-fitting.
+        """
+        add_rows = np.asarray(add_rows, dtype=np.int64)
+        keep = ~np.isin(self.rows, remove_rows)
+        self.rows = np.concatenate([self.rows[keep], add_rows])
+        self.codes = np.concatenate([self.codes[keep], self._encode(vectors, add_rows, chunk_size)])
+        return self
+
+    @property
+    def nbytes(self):
+        extra = sum(a.nbytes for a in (self.scale, self.mean, self.components) if a is not None)
+        return self.codes.nbytes + extra
+
+    def approximate_scores(self, queries, chunk_size=8192):
+        queries = normalize_rows(np.atleast_2d(queries))
+        if self.mode == 'int8':
+            # Fold the per-dimension scale into the query instead of dequantizing the matrix
+            projected = queries * self.scale
+        elif self.mode == 'pca':
+            projected = queries @ self.components.T
+        elif self.mode == 'truncate':
+            projected = queries[:, :self.dim]
+        else:
+            projected = queries
+
+        # Upcast the codes one chunk at a time so the float32 copy stays bounded
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), chunk_size):
+            chunk = self.codes[start:start + chunk_size].astype(np.float32, copy=False)
+            scores[:, start:start + chunk_size] = projected @ chunk.T
+        if self.mode == 'pca':
+            scores += (queries @ self.mean)[:, None]
+        return scores
+
+    def search(self, queries, k, full_vectors):
+        """
+        Top-k per query: compressed candidate scan, then exact re-scoring of candidates
+        against `full_vectors`, the matrix passed to `build`. Ids are its row numbers.
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        n_candidates = min(len(self.codes), max(k, k * self.rescore_factor))
+        _, positions = top_k(self.approximate_scores(queries), n_candidates)
+        candidates = np.where(positions >= 0, self.rows[np.maximum(positions, 0)], -1)
+
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, row_candidates in enumerate(candidates):
+            # Only the candidate rows are read, so a memory-mapped matrix stays mostly on disk
+            row_candidates = np.sort(row_candidates[row_candidates >= 0])
+            exact = normalize_rows(full_vectors[row_candidates]) @ queries[row]
+            scores, local = top_k(exact, k)
+            valid = local[0] >= 0
+            all_scores[row, valid] = scores[0, valid]
+            all_ids[row, valid] = row_candidates[local[0, valid]]
+        return all_scores, all_ids
+
+
+def compression_report(full_vectors, queries, k=10, modes=COMPRESSION_MODES, **params):
+    """
+    Compare each compressed mode with the exact float32 scan.
+
+    Returns {mode: {'bytes', 'ratio', 'recall_at_k', 'query_ms'}} plus an 'exact' entry
+    with the float32 footprint and latency.
+    """
+    full = normalize_rows(full_vectors)
+    queries = normalize_rows(np.atleast_2d(queries))
+
+    start = time.perf_counter()
+    _, exact_ids = top_k(queries @ full.T, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    report = {'exact': {'bytes': int(full.nbytes), 'ratio': 1.0, 'recall_at_k': 1.0, 'query_ms': exact_ms}}
+    for mode in modes:
+        search = CompressedSearch(mode=mode, **params).build(full)
+        start = time.perf_counter()
+        _, ids = search.search(queries, k, full)
+        query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        hits = sum(len(set(a[a >= 0]) & set(b[b >= 0])) for a, b in zip(ids, exact_ids))
+        report[mode] = {
+            'bytes': int(search.nbytes),
+            'ratio': full.nbytes / search.nbytes,
+            'recall_at_k': hits / exact_ids[exact_ids >= 0].size,
+            'query_ms': query_ms,
+        }
+    return report
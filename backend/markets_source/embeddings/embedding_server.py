@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import numpy as np
+
+# Wire format, both directions: 4-byte little-endian length, then the frame.
+# Requests are JSON. Responses start with one kind byte: b'J' JSON, b'E' error message,
+# b'M' matrix ('<II' rows, dim, then row-major little-endian float32 values).
+LENGTH = struct.Struct('<I')
+MATRIX_HEADER = struct.Struct('<II')
+
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+DEFAULT_MODEL = 'nvidia/NV-Embed-v2'
+
+
+def parse_address(address):
+    """'host:port' for TCP, anything containing a path separator for a Unix socket."""
+    if '/' in address or '\\' in address:
+        return 'unix', address
+    host, _, port = address.rpartition(':')
+    return 'tcp', (host or '127.0.0.1', int(port))
+
+
+class EmbeddingServer:
+    """
+    Long-running embedding service: loads the model once and coalesces concurrent
+    requests into micro-batches.
+
+    A batch is dispatched when it reaches `max_batch_size` texts or when the oldest
+    queued request has waited `max_wait_ms`, whichever comes first.
+    """
+
+    def __init__(self, model, model_name=DEFAULT_MODEL, max_batch_size=32, max_wait_ms=10):
+        self.model = model
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.queued_texts = 0
+        # A single worker: the model already parallelizes a batch internally
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.metrics = {'requests': 0, 'batches': 0, 'texts': 0, 'max_batch_size': 0, 'encode_seconds': 0.0}
+
+    def stats(self):
+        batches = self.metrics['batches']
+        return {
+            'model': self.model_name,
+            'queue_depth': self.queue.qsize(),
+            'queued_texts': self.queued_texts,
+            'avg_batch_size': self.metrics['texts'] / batches if batches else 0.0,
+            **self.metrics,
+        }
+
+    async def encode(self, texts, normalize):
+        future = asyncio.get_running_loop().create_future()
+        self.queued_texts += len(texts)
+        await self.queue.put((texts, normalize, future))
+        return await future
+
+    async def _next_batch(self):
+        # Block for the first request, then gather more until the size cap or the deadline
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    async def batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            for normalize in (True, False):
+                group = [item for item in batch if item[1] == normalize]
+                if not group:
+                    continue
+                texts = [text for item in group for text in item[0]]
+                self.queued_texts -= len(texts)
+                start = time.perf_counter()
+                try:
+                    embeddings = await loop.run_in_executor(
+                        self.executor,
+                        lambda: np.asarray(self.model.encode(
+                            texts, batch_size=len(texts), normalize_embeddings=normalize
+                        ), dtype='<f4')
+                    )
+                except Exception as e:
+                    for _, _, future in group:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                self.metrics['encode_seconds'] += time.perf_counter() - start
+                self.metrics['batches'] += 1
+                self.metrics['texts'] += len(texts)
+                self.metrics['max_batch_size'] = max(self.metrics['max_batch_size'], len(texts))
+
+                offset = 0
+                for item_texts, _, future in group:
+                    if not future.done():
+                        future.set_result(embeddings[offset:offset + len(item_texts)])
+                    offset += len(item_texts)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+                except asyncio.IncompleteReadError:
+                    break
+                request = json.loads(await reader.readexactly(length))
+                self.metrics['requests'] += 1
+                try:
+                    if request.get('op') == 'stats':
+                        frame = b'J' + json.dumps(self.stats()).encode('utf-8')
+                    else:
+                        texts = request['texts']
+                        embeddings = await self.encode(texts, request.get('normalize', True)) if texts else np.empty((0, 0), '<f4')
+                        rows, dim = embeddings.shape if embeddings.ndim == 2 else (0, 0)
+                        frame = b'M' + MATRIX_HEADER.pack(rows, dim) + embeddings.tobytes()
+                except Exception as e:
+                    frame = b'E' + str(e).encode('utf-8')
+                writer.write(LENGTH.pack(len(frame)) + frame)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, address=DEFAULT_ADDRESS):
+        kind, target = parse_address(address)
+        if kind == 'unix':
+            if os.path.exists(target):
+                os.remove(target)
+            server = await asyncio.start_unix_server(self.handle_connection, path=target)
+        else:
+            server = await asyncio.start_server(self.handle_connection, *target)
+        print(f"Embedding server for '{self.model_name}' listening on {address}")
+        batcher = asyncio.create_task(self.batch_loop())
+        async with server:
+            try:
+                await server.serve_forever()
+            finally:
+                batcher.cancel()
+
+
+class EmbeddingClient:
+    """
+    Thin client with the subset of SentenceTransformer's interface EventMatcher uses,
+    so it can stand in for `self.model`. Each thread keeps its own connection.
+    """
+    tokenizer = None
+
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=120):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            kind, target = parse_address(self.address)
+            if kind == 'unix':
+                conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            else:
+                conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn.settimeout(self.timeout)
+            conn.connect(target)
+            self._local.conn = conn
+        return conn
+
+    def _recv_exactly(self, conn, size):
+        buf = bytearray()
+        while len(buf) < size:
+            chunk = conn.recv(size - len(buf))
+            if not chunk:
+                raise ConnectionError("Embedding server closed the connection.")
+            buf.extend(chunk)
+        return bytes(buf)
+
+    def _call(self, request):
+        payload = json.dumps(request).encode('utf-8')
+        try:
+            conn = self._connection()
+            conn.sendall(LENGTH.pack(len(payload)) + payload)
+            (length,) = LENGTH.unpack(self._recv_exactly(conn, LENGTH.size))
+            frame = self._recv_exactly(conn, length)
+        except (OSError, ConnectionError):
+            # Drop the broken connection so the next call reconnects
+            conn = getattr(self._local, 'conn', None)
+            if conn is not None:
+                conn.close()
+            self._local.conn = None
+            raise
+        kind, body = frame[:1], frame[1:]
+        if kind == b'E':
+            raise RuntimeError(f"Embedding server error: {body.decode('utf-8')}")
+        if kind == b'J':
+            return json.loads(body)
+        rows, dim = MATRIX_HEADER.unpack_from(body)
+        return np.frombuffer(body, dtype='<f4', count=rows * dim, offset=MATRIX_HEADER.size).reshape(rows, dim)
+
+    def encode(self, sentences, batch_size=None, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = self._call({'op': 'encode', 'texts': texts, 'normalize': bool(normalize_embeddings)})
+        return embeddings[0] if single else embeddings
+
+    def stats(self):
+        return self._call({'op': 'stats'})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve sentence embeddings with dynamic micro-batching.")
+    parser.add_argument('--address', default=os.getenv('EMBEDDING_SERVER', DEFAULT_ADDRESS))
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(args.model, device='cpu', trust_remote_code=True)
+    model.max_seq_length = 32768
+    model.tokenizer.padding_side = "right"
+    print(f"Loaded model '{args.model}' successfully.")
+
+    server = EmbeddingServer(model, args.model, args.max_batch_size, args.max_wait_ms)
+    asyncio.run(server.serve(args.address))
+
+
+if __name__ == "__main__":
+    main()
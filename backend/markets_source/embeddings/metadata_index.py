@@ -0,0 +1,80 @@
+import numpy as np
+from data.event_models import METADATA_FILTERS, EventTable, end_date_bounds
+
+
+class MetadataIndex:
+    """
+    Prefilter indexes over the StandardizedEvent metadata of one catalogue.
+
+    Categorical columns (source, status) keep an inverted index of row ids per value;
+    numeric columns (end date, liquidity) keep a sorted copy so a range filter is two
+    binary searches. `select` intersects the eligible row sets, smallest first, so a
+    filtered search only scores the rows that can match.
+    """
+
+    def __init__(self, events):
+        # Built straight from the typed columns of an EventTable (lists of events are converted)
+        table = EventTable.from_events(events)
+        self.size = len(table)
+
+        self.categories = {}
+        for column in ('source', 'status'):
+            codes = table.codes[column]
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(table.categories[column]) + 1))
+            self.categories[column] = {
+                value: order[bounds[code]:bounds[code + 1]].astype(np.int64)
+                for code, value in enumerate(table.categories[column])
+            }
+
+        self.ranges = {
+            'end_ts': self._sorted_column(table.column('end_ts')),
+            'liquidity': self._sorted_column(table.column('liquidity')),
+        }
+
+    @staticmethod
+    def _sorted_column(values):
+        # Rows with unknown values never match a range filter
+        rows = np.flatnonzero(~np.isnan(values))
+        order = rows[np.argsort(values[rows], kind='stable')]
+        return values[order], order
+
+    def _range_rows(self, column, low=None, high=None):
+        values, order = self.ranges[column]
+        start = np.searchsorted(values, low, side='left') if low is not None else 0
+        end = np.searchsorted(values, high, side='right') if high is not None else len(values)
+        return np.sort(order[start:end])
+
+    def select(self, filters, now=None):
+        """Sorted row ids matching every filter in `filters` (see METADATA_FILTERS)."""
+        unknown = set(filters) - set(METADATA_FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown filters {sorted(unknown)}. Expected any of {METADATA_FILTERS}.")
+
+        candidates = []
+        for column in ('source', 'status'):
+            wanted = filters.get(column)
+            if wanted is None:
+                continue
+            wanted = [wanted] if isinstance(wanted, str) else wanted
+            postings = [self.categories[column].get(value) for value in wanted]
+            postings = [rows for rows in postings if rows is not None]
+            candidates.append(np.unique(np.concatenate(postings)) if postings else np.empty(0, dtype=np.int64))
+
+        after, before = end_date_bounds(filters, now)
+        if after is not None or before is not None:
+            candidates.append(self._range_rows(
+                'end_ts',
+                after.timestamp() if after else None,
+                before.timestamp() if before else None,
+            ))
+        if filters.get('min_liquidity') is not None or filters.get('max_liquidity') is not None:
+            candidates.append(self._range_rows('liquidity', filters.get('min_liquidity'), filters.get('max_liquidity')))
+
+        if not candidates:
+            return np.arange(self.size, dtype=np.int64)
+        candidates.sort(key=len)
+        rows = candidates[0]
+        for other in candidates[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+from embeddings.codec import encode_embedding, decode_embedding
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings with a per-entry TTL.
+
+    Keys are sanitized query texts, so headlines that only differ in case, punctuation
+    or numbers share an entry. An optional synchronous Redis client (redis.Redis with
+    decode_responses=False) acts as a second tier shared between processes; entries are
+    stored with the binary embedding codec and expire through Redis' own TTL.
+
+    Safe to use from the encoder's worker threads.
+    """
+
+    def __init__(self, maxsize=1024, ttl=600, redis_client=None, namespace='query_embedding'):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.redis_client = redis_client
+        self.namespace = namespace
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _redis_key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, embedding = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+                del self._entries[key]
+
+        if self.redis_client is not None:
+            try:
+                buf = self.redis_client.get(self._redis_key(key))
+            except Exception as e:
+                print(f"Query cache Redis lookup failed: {e}")
+                buf = None
+            if buf is not None:
+                embedding = decode_embedding(buf)
+                self._store_local(key, embedding)
+                with self._lock:
+                    self.redis_hits += 1
+                return embedding
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store_local(self, key, embedding):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def put(self, key, embedding):
+        self._store_local(key, embedding)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.set(self._redis_key(key), encode_embedding(embedding), ex=int(self.ttl))
+            except Exception as e:
+                print(f"Query cache Redis write failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'redis_hits': self.redis_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.redis_hits) / lookups if lookups else 0.0,
+            }
@@ -1,9 +1,8 @@
 import asyncio
 import json
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.preprocessing import normalize
 import redis.asyncio as redis  # Updated import
+from redis import Redis
 import os
 from dotenv import load_dotenv
 import re
@@ -11,7 +10,20 @@ from sentence_transformers import SentenceTransformer
 import torch
 import concurrent.futures
 import gc
-from storage.db import VectorDatabase 
+import functools
+import hashlib
+from storage import STORAGE_DIR
+from storage.backends import open_vector_database
+from embeddings.ann_index import create_index, load_index, fingerprint_ids
+from embeddings.codec import encode_embedding, decode_embedding, is_legacy
+from embeddings.vector_store import MmapVectorStore
+from embeddings.compressed import CompressedSearch, compression_report
+from embeddings.query_cache import QueryEmbeddingCache
+from embeddings.bulk_encoder import BulkEncoder
+from embeddings.embedding_server import EmbeddingClient
+from embeddings.metadata_index import MetadataIndex
+from data.event_models import EventTable, event_metadata
+from data.snapshot import load_table
 
 
 # Clear CUDA cache
@@ -27,50 +39,115 @@ if torch.cuda.is_available():
 load_dotenv()
 
 class EventMatcher:
-    def __init__(self):
+    def __init__(self, index_type='ivf', index_params=None, embedding_dtype='float32',
+                 search_mode=None, search_params=None,
+                 query_cache_size=1024, query_cache_ttl=600, query_cache_redis_url=None,
+                 embedding_server=None, model=None, model_name=None, vector_db=None,
+                 max_pending_writes=4):
         # Garbage collection and CUDA cache clearing before model loading
         gc.collect()
         torch.cuda.empty_cache()
 
-        # Determine the base directory dynamically
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        
-        # Define a single data source for aggregated events
+        # Define a single data source for aggregated events; its snapshots, vector store and
+        # index live next to it in the shared storage directory (see fetch_embed_events.storage_paths)
         self.data_sources = {
-            'all_markets': os.path.join(base_dir, 'storage', 'AllMarketsEvents.json')
+            'all_markets': os.path.join(STORAGE_DIR, 'AllMarketsEvents.json')
         }
         
+        # Per source: the vector store's memory map (one row per unique text), the store row of
+        # every market, and the in-use rows sorted with the markets they fan out to
         self.embeddings = {}
+        self.market_rows = {}
+        self.content_rows = {}
+        self.markets_by_row = {}
         self.data = {}
+        self.metadata = {}  # Prefilter indexes over source/status/end_date/liquidity per source
         self.redis_client = None
 
-        # Initialize the MongoDB vector database
-        mongo_uri = os.getenv("MONGO_URI")  # MongoDB URI
-        mongo_cert_file = os.getenv("MONGO_CERT_FILE")  # MongoDB certificate file path
-        self.vector_db = VectorDatabase(mongo_uri, mongo_cert_file)
+        # Embeddings are cached in Redis as binary float32 ('float16' halves the size)
+        self.embedding_dtype = embedding_dtype
+
+        # Approximate nearest-neighbour index per source ('ivf', 'hnsw' or 'flat' for exact).
+        # index_params tunes recall vs latency, e.g. {'n_probe': 16} or {'ef_search': 128}.
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.indexes = {}
+
+        # Optional compressed search ('float16', 'int8', 'pca' or 'truncate'); candidates are
+        # re-scored against the full-precision vectors. search_params e.g. {'dim': 512}.
+        self.search_mode = search_mode
+        self.search_params = search_params or {}
+        self.compressed = {}
+
+        # Memory-mapped on-disk embedding matrices keyed by content hash, one per source,
+        # shared between processes
+        self.vector_stores = {}
+
+        # Initialize the vector database (or use the one passed in, e.g. by benchmarks).
+        # VECTOR_DB_BACKEND selects remote MongoDB ('mongo', default) or the embedded
+        # single-node store ('embedded', under VECTOR_DB_PATH)
+        if vector_db is None:
+            vector_db = open_vector_database(asynchronous=True)
+        self.vector_db = vector_db
+
+        # Load NV-Embed-v2 model with Sentence-Transformers, or use a shared embedding server
+        # (embeddings/embedding_server.py) so the model is loaded once for all processes.
+        # model_name goes into every embedding cache key, so it must name the model that
+        # actually encodes: the server reports its own, a passed-in model is named by the caller.
+        embedding_server = embedding_server or os.getenv("EMBEDDING_SERVER")
+        if model is not None:
+            self.model = model
+            model_name = model_name or type(model).__name__
+        elif embedding_server:
+            self.model = EmbeddingClient(embedding_server)
+            model_name = self.model.stats()['model']
+            print(f"Using embedding server at {embedding_server} for '{model_name}'.")
+        else:
+            model_name = model_name or 'nvidia/NV-Embed-v2'  # Ensure this is the correct model name
+            try:
+                self.model = SentenceTransformer(model_name, device=device, trust_remote_code=True)
+                self.model.max_seq_length = 32768
+                self.model.tokenizer.padding_side = "right"
+                print(f"Loaded model '{model_name}' successfully.")
+            except Exception as e:
+                print(f"Failed to load model '{model_name}': {e}")
+                raise e
+
+            # Garbage collection and CUDA cache clearing after model loading
+            gc.collect()
+            torch.cuda.empty_cache()
+        self.model_name = model_name
+
+        # Query-side embedding cache keyed on the sanitized headline, so repeated headlines
+        # from the live pipeline skip the encoder. Optionally backed by Redis across processes,
+        # under a per-model namespace.
+        query_cache_redis = Redis.from_url(query_cache_redis_url, decode_responses=False) if query_cache_redis_url else None
+        self.query_cache = QueryEmbeddingCache(query_cache_size, query_cache_ttl, query_cache_redis,
+                                               namespace=f"query_embedding:{model_name}")
 
-        # Load NV-Embed-v2 model with Sentence-Transformers
-        model_name = 'nvidia/NV-Embed-v2'  # Ensure this is the correct model name
-        try:
-            self.model = SentenceTransformer(model_name, device=device, trust_remote_code=True)
-            self.model.max_seq_length = 32768
-            self.model.tokenizer.padding_side = "right"
-            print(f"Loaded model '{model_name}' successfully.")
-        except Exception as e:
-            print(f"Failed to load model '{model_name}': {e}")
-            raise e
-        
-        # Garbage collection and CUDA cache clearing after model loading
-        gc.collect()
-        torch.cuda.empty_cache()
-        
         # Initialize ThreadPoolExecutor for asynchronous encoding
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)  # Adjust as needed
 
+        # Markets per vector database write when re-sending stored vectors
+        self.write_chunk_size = 1000
+
+        # Encoded batches whose vector database write may still be in flight; encoding waits
+        # for a slot, so a slow database can't make every batch's documents pile up in memory
+        self.max_pending_writes = max_pending_writes
+
+        # Single thread for synchronous vector database writes so they overlap with encoding without reordering
+        self.db_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+        # Length-bucketed bulk encoding that keeps every executor worker busy
+        self.bulk_encoder = BulkEncoder(self.model, self.executor, max_in_flight=self.executor._max_workers)
+
     async def initialize_redis(self):
+        # One client for the matcher's lifetime; a long-running caller re-enters here every flush
+        if self.redis_client is not None:
+            return
         print("Initializing Redis client")
-        # Updated to use redis.asyncio.from_url
-        self.redis_client = redis.from_url("redis://localhost", encoding="utf-8", decode_responses=True)
+        # Embeddings are stored as raw bytes, so responses must not be decoded to str
+        self.redis_client = redis.from_url("redis://localhost", decode_responses=False)
         try:
             await self.redis_client.ping()
             print("Connected to Redis successfully.")
@@ -88,115 +165,555 @@ class EventMatcher:
             print(f"Error loading JSON file {file_path}: {e}")
             return []
 
+    def snapshot_dir(self, source_name):
+        return os.path.join(os.path.dirname(self.data_sources[source_name]), 'snapshots')
+
+    def load_events(self, source_name):
+        # Prefer the latest Parquet snapshot (see data/snapshot.py); fall back to the JSON catalogue
+        root = self.snapshot_dir(source_name)
+        try:
+            table = load_table(root)
+            if table is not None:
+                print(f"Loaded {len(table)} events from snapshot in {root}")
+                return table
+        except Exception as e:
+            print(f"Error loading snapshot from {root}: {e}")
+        return self.load_json(self.data_sources[source_name])
+
     def sanitize_sentence(self, sentence):
         # Remove non-word characters, replace digits with <num>, and strip whitespace
         sanitized = re.sub(r'\d+', '<num>', re.sub(r'[^\w\s]', '', re.sub(r'\s+', ' ', sentence.lower()))).strip()
         return sanitized
 
+    def content_hash(self, sanitized_text):
+        # Embeddings depend only on the model and the sanitized text, not on the market
+        return hashlib.sha1(f"{self.model_name}\0{sanitized_text}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def market_key(venue, market_id):
+        # Venues reuse ids (Futuur and PredictIt both number their markets), so the content
+        # map and vector database documents key markets by venue as well
+        return f"{venue}:{market_id}"
+
+    @staticmethod
+    def document_name(source_name, venue, market_id):
+        return f"{source_name}_{venue}_{market_id}"
+
+    def open_vector_store(self, source_name):
+        if source_name not in self.vector_stores:
+            directory = os.path.join(os.path.dirname(self.data_sources[source_name]), 'vectors')
+            self.vector_stores[source_name] = MmapVectorStore(directory, f"{source_name}-by-content")
+        store = self.vector_stores[source_name]
+        store.refresh()
+        return store
+
+    async def content_map_changes(self, source_name, market_keys, content_hashes):
+        """
+        Compare market key (see market_key) -> content hash with the map recorded in Redis.
+
+        Returns (changed, removed, orphaned): entries that are new or changed (the markets
+        whose vector database document needs a new vector), market ids no longer listed, and
+        cached vectors no market uses anymore. A headline edited under the same market_id
+        hashes differently, so its stale vector is never looked up again. If Redis can't be
+        read, every market counts as changed.
+        """
+        new_map = dict(zip(market_keys, content_hashes))
+        try:
+            old_map = {k.decode('utf-8'): v.decode('utf-8')
+                       for k, v in (await self.redis_client.hgetall(f"{source_name}:market_content_hash")).items()}
+        except Exception as e:
+            print(f"Failed to read content hash map from Redis: {e}")
+            return new_map, [], set()
+        changed = {k: v for k, v in new_map.items() if old_map.get(k) != v}
+        changed_headlines = sum(1 for k in changed if k in old_map)
+        if changed_headlines:
+            print(f"{changed_headlines} markets in '{source_name}' changed headline since the last run.")
+        removed = [k for k in old_map if k not in new_map]
+        orphaned = set(old_map.values()) - set(new_map.values())
+        return changed, removed, orphaned
+
+    async def commit_content_map(self, source_name, changed, removed=(), orphaned=()):
+        """
+        Record content map changes in Redis once the vectors they describe are written, so a
+        failed write is retried on the next run, and reclaim the space of orphaned vectors.
+        """
+        map_key = f"{source_name}:market_content_hash"
+        try:
+            if changed:
+                await self.redis_client.hset(map_key, mapping=changed)
+            if removed:
+                await self.redis_client.hdel(map_key, *removed)
+            if orphaned:
+                await self.redis_client.delete(*[f"embedding:{h}" for h in orphaned])
+                print(f"Invalidated {len(orphaned)} stale embeddings for '{source_name}'.")
+        except Exception as e:
+            print(f"Failed to update content hash map in Redis: {e}")
+
+    async def migrate_content_map(self, source_name, content_hashes):
+        """
+        Retire the content map keyed by bare market_id, whose vector database documents were
+        named `{source}_{market_id}`. Runs once the markets are written under their venue-keyed
+        names: the old documents are deleted, then the old map and embeddings no market uses.
+        """
+        legacy_key = f"{source_name}:content_hash"
+        try:
+            legacy_map = {k.decode('utf-8'): v.decode('utf-8')
+                          for k, v in (await self.redis_client.hgetall(legacy_key)).items()}
+        except Exception as e:
+            print(f"Failed to read legacy content hash map from Redis: {e}")
+            return
+        if not legacy_map:
+            return
+        names = [f"{source_name}_{market_id}" for market_id in legacy_map]
+        deleted = await self.call_vector_db(self.vector_db.delete_documents, names)
+        print(f"Deleted {deleted} of {len(names)} documents named by bare market_id for '{source_name}'.")
+        orphaned = set(legacy_map.values()) - set(content_hashes)
+        try:
+            await self.redis_client.delete(legacy_key, *[f"embedding:{h}" for h in orphaned])
+        except Exception as e:
+            print(f"Failed to delete legacy content hash map from Redis: {e}")
+
     async def generate_embeddings(self, source_name, data):
+        # Catalogues are kept as column arrays; rows still read back as event dicts
+        data = EventTable.from_events(data)
         self.data[source_name] = data
-        batch_size = 8  # Adjust based on your GPU memory
-        descriptions = [self.sanitize_sentence(item['headline']) for item in data]
-        market_ids = [item['market_id'] for item in data]
-        cache_keys = [f"{source_name}:embedding:{market_id}" for market_id in market_ids]
-        cached_embeddings = await self.redis_client.mget(*cache_keys)
-
-        # Determine which embeddings need to be fetched
-        to_fetch = [i for i, emb in enumerate(cached_embeddings) if emb is None]
-        fetched_embeddings = [] 
-
-        # Ensure we only fetch if there are embeddings to fetch
-        if not to_fetch:
-            print(f"All embeddings for '{source_name}' are already cached.")
-            self.embeddings[source_name] = np.array([json.loads(emb) for emb in cached_embeddings if isinstance(emb, str)])
-            return
+        self.metadata[source_name] = MetadataIndex(data)
+        descriptions = [self.sanitize_sentence(headline) for headline in data.column('headline')]
+        market_keys = [self.market_key(venue, market_id)
+                       for venue, market_id in zip(data.column('source'), data.column('market_id'))]
+        content_hashes = [self.content_hash(text) for text in descriptions]
+        changed, removed, orphaned = await self.content_map_changes(source_name, market_keys, content_hashes)
+
+        # Every market whose market key -> hash entry is new or changed gets its vector written,
+        # including ones whose text was encoded before (digits sanitize to <num>, so a new
+        # strike of an existing series usually reuses a stored vector)
+        markets_by_hash = {}
+        for row, (key, h) in enumerate(zip(market_keys, content_hashes)):
+            if key in changed:
+                markets_by_hash.setdefault(h, []).append(data[row])
+
+        store = self.open_vector_store(source_name)
+        await self.write_vectors(source_name, store, dict(zip(content_hashes, descriptions)), markets_by_hash)
+        await self.commit_content_map(source_name, changed, removed, orphaned)
+        await self.migrate_content_map(source_name, content_hashes)
+
+        # Index the store's memory map in place: one row per unique text, plus each market's row
+        self.set_rows(source_name, *store.view(content_hashes))
+        print(f"Generated embeddings for '{source_name}'.")
+        # Markets just written to the vector database
+        return set(changed)
 
-        # Prepare texts for embeddings
-        texts_to_encode = [descriptions[i] for i in to_fetch]
-
-        # Encode queries in batches using ThreadPoolExecutor to prevent blocking
-        for batch_start in range(0, len(texts_to_encode), batch_size):
-            batch_texts = texts_to_encode[batch_start:batch_start + batch_size]
-            print(f"Encoding embeddings for '{source_name}' - Batch {batch_start // batch_size + 1}")
-            loop = asyncio.get_event_loop()
-            batch_embeddings = await loop.run_in_executor(
-                self.executor,
-                lambda texts: self.model.encode(
-                    texts,
-                    batch_size=batch_size,
-                    normalize_embeddings=True
-                ),
-                batch_texts
-            )
-            fetched_embeddings.extend(batch_embeddings)
-
-        # Cache embeddings in Redis and send them to MongoDB
-        cache_dict = {}
-        for j, index in enumerate(to_fetch):
-            cache_key = cache_keys[index]
-            emb = fetched_embeddings[j]
-            cache_dict[cache_key] = json.dumps(emb.tolist())
-
-            # Insert embedding into MongoDB (sending embedding to MongoDB vector DB)
-            market_id = market_ids[index]  # This line will now only run if there are embeddings to fetch
+    async def write_vectors(self, source_name, store, texts, markets_by_hash):
+        """
+        Bring every text of `texts` ({content hash: sanitized text}) into the vector store and
+        write the markets of `markets_by_hash` to the vector database with their vectors.
+        """
+        # Texts already in the on-disk store need neither Redis nor the model
+        missing = [h for h in texts if h not in store]
+        if missing:
+            print(f"{len(missing)} unique texts for '{source_name}' are not in the vector store.")
+            await self.embed_missing(source_name, store, missing, texts, markets_by_hash)
+        else:
+            print(f"All embeddings for '{source_name}' are already in the vector store.")
+
+        # Changed markets whose vector was already stored or came from Redis
+        stored = list(markets_by_hash)
+        for start in range(0, len(stored), self.write_chunk_size):
+            hashes = stored[start:start + self.write_chunk_size]
+            await self.insert_vectors(source_name, hashes, store.get(hashes), markets_by_hash)
+
+    def set_rows(self, source_name, matrix, rows):
+        self.embeddings[source_name] = matrix
+        self.market_rows[source_name] = rows
+        self.content_rows[source_name] = np.unique(rows)
+        order = np.argsort(rows, kind='stable')
+        self.markets_by_row[source_name] = (order, rows[order])
+
+    async def embed_missing(self, source_name, store, missing, texts, markets_by_hash):
+        """Move `missing` texts into the store from Redis or the model, writing their markets' vectors on the way."""
+        cache_keys = {h: f"embedding:{h}" for h in missing}
+        found = {h: emb for h, emb in zip(missing, await self.redis_client.mget(*cache_keys.values()))
+                 if emb is not None}
+
+        # Before embeddings were keyed by content they were cached per market as
+        # `{source}:embedding:{market_id}`; on a miss, fall back to one of the text's markets.
+        # Those entries carry no text to check, so they are trusted as the old code trusted them
+        old_keys = {h: f"{source_name}:embedding:{markets_by_hash[h][0]['market_id']}"
+                    for h in missing if h not in found and markets_by_hash.get(h)}
+        if old_keys:
+            old_found = {h: emb for h, emb in zip(old_keys, await self.redis_client.mget(*old_keys.values()))
+                         if emb is not None}
+            found.update(old_found)
+            old_keys = {h: key for h, key in old_keys.items() if h in old_found}
+
+        # Decode cached entries; legacy JSON and per-market entries are re-stored as binary
+        # under their content hash
+        cached = {}
+        migrated = {}
+        for h, emb in found.items():
+            cached[h] = decode_embedding(emb)
+            if is_legacy(emb) or h in old_keys:
+                migrated[cache_keys[h]] = encode_embedding(cached[h], self.embedding_dtype)
+        if migrated:
+            print(f"Migrating {len(migrated)} legacy embeddings for '{source_name}' to content-hash keys.")
+            await self.cache_embeddings(source_name, migrated)
+        if old_keys:
             try:
-                self.vector_db.add_document(f"{source_name}_{market_id}", emb.tolist())
-                print(f"Inserted embedding for '{source_name}' market_id: {market_id} into MongoDB.")
+                await self.redis_client.delete(*[f"{source_name}:embedding:{item['market_id']}"
+                                                 for h in old_keys for item in markets_by_hash[h]])
             except Exception as e:
-                print(f"Failed to insert embedding for '{source_name}' market_id: {market_id} into MongoDB: {e}")
+                print(f"Failed to delete per-market embeddings from Redis: {e}")
+        if cached:
+            store.append(list(cached), np.stack(list(cached.values())))
+            print(f"Appended {len(cached)} Redis-cached embeddings to the '{source_name}' vector store.")
+
+        # Encode the rest; each unique text is encoded once and every finished batch is
+        # streamed to Redis, MongoDB and the vector store while later batches still run
+        to_fetch = [h for h in missing if h not in cached]
+
+        # Database writes run as tasks so the next batch is consumed while they are in flight,
+        # up to max_pending_writes at a time
+        slots = asyncio.Semaphore(self.max_pending_writes)
+
+        async def insert(hashes, batch_embeddings):
+            try:
+                await self.insert_vectors(source_name, hashes, batch_embeddings, markets_by_hash)
+            finally:
+                slots.release()
+
+        inserts = []
+        async for positions, batch_embeddings in self.bulk_encoder.encode([texts[h] for h in to_fetch]):
+            hashes = [to_fetch[p] for p in positions]
+            await self.cache_embeddings(source_name, {
+                cache_keys[h]: encode_embedding(emb, self.embedding_dtype) for h, emb in zip(hashes, batch_embeddings)
+            })
+            await slots.acquire()
+            inserts.append(asyncio.create_task(insert(hashes, batch_embeddings)))
+            store.append(hashes, batch_embeddings)
+        await asyncio.gather(*inserts)
+        # Every encoded text's markets are written; the rest are written from the store
+        for h in to_fetch:
+            markets_by_hash.pop(h, None)
+
+    async def cache_embeddings(self, source_name, cache_dict):
+        try:
+            await self.redis_client.mset(cache_dict)
+            print(f"Cached {len(cache_dict)} embeddings for '{source_name}'.")
+        except Exception as e:
+            print(f"Failed to cache embeddings in Redis: {e}")
+
+    async def insert_vectors(self, source_name, hashes, embeddings, markets_by_hash):
+        # Upsert the markets of `hashes` with their vectors as one chunked bulk write. The
+        # async Mongo client is awaited directly on its connection pool; synchronous backends
+        # run on their own thread so encoding of later batches keeps running meanwhile.
+        # Market metadata travels with the vector so database-side searches can prefilter.
+        documents = [
+            {'name': self.document_name(source_name, item['source'], item['market_id']), 'embedding': emb,
+             'metadata': event_metadata(item)}
+            for h, emb in zip(hashes, embeddings)
+            for item in markets_by_hash.get(h, ())
+        ]
+        if not documents:
+            return
+        stats = await self.upsert_documents(documents)
+        print(f"Upserted {len(documents)} embeddings for '{source_name}' into the vector database: {stats}")
+
+    async def upsert_documents(self, documents):
+        # Backends retry transient errors and count what still failed; any failure must fail the
+        # run, so the delta isn't checkpointed and its markets are written again next time
+        stats = await self.call_vector_db(self.vector_db.upsert_documents, documents)
+        if stats.get('failed'):
+            raise RuntimeError(f"{stats['failed']} of {len(documents)} vector database upserts failed.")
+        return stats
+
+    async def call_vector_db(self, method, *args, **kwargs):
+        # The async Mongo client's coroutines are awaited directly; synchronous backends run on the writer thread
+        if asyncio.iscoroutinefunction(method):
+            return await method(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.db_executor, functools.partial(method, *args, **kwargs))
+
+    async def apply_deltas(self, source_name, deltas, upserted=()):
+        """
+        Mirror a delta sync (see data/delta_sync.py) into the vector database.
 
-        # Cache the newly fetched embeddings
-        if cache_dict:
+        Markets whose key is in `upserted` (new or changed content hash) were already written
+        with their vector by generate_embeddings. The other added/changed markets kept their
+        text, so only their metadata is updated; closed markets are deleted in batches. Errors
+        propagate, so the caller never checkpoints a delta that wasn't applied.
+        """
+        documents = [
+            {'name': self.document_name(source_name, delta.venue, event['market_id']), 'metadata': event_metadata(event)}
+            for delta in deltas for event in delta.upserts()
+            if self.market_key(delta.venue, event['market_id']) not in upserted
+        ]
+        if documents:
+            matched = await self.call_vector_db(self.vector_db.update_metadata, documents)
+            print(f"Updated metadata of {matched} of {len(documents)} changed markets for '{source_name}'.")
+
+        closed = [self.document_name(source_name, delta.venue, market_id)
+                  for delta in deltas for market_id in delta.closed]
+        if closed:
+            deleted = await self.call_vector_db(self.vector_db.delete_documents, closed)
+            print(f"Deleted {deleted} of {len(closed)} closed markets for '{source_name}'.")
+
+    def index_path(self, source_name):
+        # Persist the index next to the source JSON, e.g. AllMarketsEvents.index.npz
+        return os.path.splitext(self.data_sources[source_name])[0] + '.index.npz'
+
+    def index_ids(self, source_name):
+        # The index covers the store rows of the texts in use (markets sharing a headline share
+        # a row); fingerprint them with their content hashes so any change invalidates it
+        keys = self.open_vector_store(source_name).keys
+        return [f"{row}:{keys[row]}" for row in self.content_rows[source_name]]
+
+    def build_index(self, source_name):
+        rows = self.content_rows[source_name]
+        row_ids = self.index_ids(source_name)
+        fingerprint = fingerprint_ids(row_ids)
+        path = self.index_path(source_name)
+
+        if os.path.exists(path):
             try:
-                await self.redis_client.mset(cache_dict)
-                print(f"Cached {len(cache_dict)} embeddings for '{source_name}'.")
+                # The file holds only the index structure; vectors are read from the store's memory map
+                index = load_index(path, self.embeddings[source_name])
+                # Search-time params (n_probe, ef_search) are applied to the loaded index;
+                # different build-time params need a rebuild
+                if (index.kind == self.index_type and index.fingerprint == fingerprint
+                        and index.configure(**self.index_params)):
+                    self.indexes[source_name] = index
+                    print(f"Loaded '{index.kind}' index for '{source_name}' from {path}")
+                    return index
+                print(f"Index at {path} is stale, rebuilding.")
             except Exception as e:
-                print(f"Failed to cache embeddings in Redis: {e}")
+                print(f"Failed to load index from {path}: {e}")
+
+        index = create_index(self.index_type, **self.index_params)
+        index.build(self.embeddings[source_name], row_ids, rows)
+        self.indexes[source_name] = index
+        try:
+            index.save(path)
+            print(f"Built and saved '{index.kind}' index for '{source_name}' to {path}")
+        except Exception as e:
+            print(f"Failed to save index to {path}: {e}")
+        return index
 
-        # Update cached_embeddings with newly fetched embeddings
-        for idx, emb in zip(to_fetch, fetched_embeddings):
-            cached_embeddings[idx] = json.dumps(emb.tolist())
+    def update_index(self, source_name, added, dropped):
+        """Add and drop store rows in the built index and compressed search, without re-training, and save the index."""
+        matrix = self.embeddings[source_name]
+        index = self.indexes[source_name].update(matrix, added, dropped, ids=self.index_ids(source_name))
+        if source_name in self.compressed:
+            self.compressed[source_name].update(matrix, added, dropped)
+        path = self.index_path(source_name)
+        try:
+            index.save(path)
+            print(f"Updated '{index.kind}' index for '{source_name}' (+{len(added)}/-{len(dropped)} texts) in {path}")
+        except Exception as e:
+            print(f"Failed to save index to {path}: {e}")
+        return index
 
-        # Convert to numpy array
-        self.embeddings[source_name] = np.array([
-            json.loads(emb) for emb in cached_embeddings if isinstance(emb, str)
-        ])
-        print(f"Generated embeddings for '{source_name}'.")
+    def _markets_from_hits(self, source_name, scores, rows, k, eligible=None):
+        """
+        Turn (scores, store rows) from a search into (scores, market rows): each hit fans out to
+        the markets sharing that text, best first, keeping the first k. Markets of one text tie
+        exactly. `eligible` is a boolean mask over markets, e.g. from a metadata prefilter.
+        """
+        order, sorted_rows = self.markets_by_row[source_name]
+        out_scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+        out_ids = np.full((len(rows), k), -1, dtype=np.int64)
+        for q, (row_scores, row_ids) in enumerate(zip(scores, rows)):
+            n = 0
+            for score, row in zip(row_scores, row_ids):
+                if row < 0 or n == k:
+                    break
+                start, end = np.searchsorted(sorted_rows, [row, row + 1])
+                markets = order[start:end]
+                if eligible is not None:
+                    markets = markets[eligible[markets]]
+                markets = markets[:k - n]
+                out_scores[q, n:n + len(markets)] = score
+                out_ids[q, n:n + len(markets)] = markets
+                n += len(markets)
+        return out_scores, out_ids
 
-    def find_similar_events(self, input_headline):
-        # Sanitize and generate embedding for the input headline
-        sanitized_headline = self.sanitize_sentence(input_headline)
-        input_embedding = self.model.encode(sanitized_headline, normalize_embeddings=True)
+    def _results_from_hits(self, source_name, scores, ids, threshold):
+        # Turn one row of (scores, market rows) into result dicts, keeping hits with score >= threshold
+        data = self.data[source_name]
+        headlines, market_ids = data.column('headline'), data.column('market_id')
+        keep = (ids >= 0) & (scores >= threshold)
+        return [
+            {
+                'headline': headlines[i],
+                'market_id': market_ids[i],
+                'similarity_score': float(score)
+            }
+            for score, i in zip(scores[keep], ids[keep])
+        ]
 
-        # Normalize stored embeddings for cosine similarity computation
-        stored_embeddings = normalize(self.embeddings['all_markets'])
-        
-        # Compute cosine similarity between input and all stored events
-        similarity_scores = cosine_similarity([input_embedding], stored_embeddings)[0]
+    def encode_queries(self, headlines):
+        """Embed headlines for querying, serving repeats from the query cache."""
+        sanitized = [self.sanitize_sentence(headline) for headline in headlines]
+        embeddings = [self.query_cache.get(text) for text in sanitized]
+        misses = list(dict.fromkeys(text for text, emb in zip(sanitized, embeddings) if emb is None))
+        if misses:
+            encoded = dict(zip(misses, self.model.encode(misses, batch_size=len(misses), normalize_embeddings=True)))
+            for text, emb in encoded.items():
+                self.query_cache.put(text, emb)
+            embeddings = [encoded[text] if emb is None else emb for text, emb in zip(sanitized, embeddings)]
+        return np.stack(embeddings)
+
+    def build_compressed(self, source_name):
+        search = CompressedSearch(self.search_mode, **self.search_params)
+        search.build(self.embeddings[source_name], self.content_rows[source_name])
+        self.compressed[source_name] = search
+        full_bytes = len(search.rows) * self.embeddings[source_name].shape[1] * 4
+        print(f"Built '{self.search_mode}' compressed search for '{source_name}': "
+              f"{search.nbytes / 1e6:.1f} MB vs {full_bytes / 1e6:.1f} MB float32")
+        return search
+
+    def search(self, source_name, query_embeddings, k, exact=False, filters=None):
+        # Route a query batch to the exact scan, the compressed mode or the ANN index.
+        # With metadata filters only the texts of eligible markets are scored, exactly.
+        # Searches run over unique texts; hits are then expanded to market rows.
+        index = self.indexes[source_name] if source_name in self.indexes else self.build_index(source_name)
+        eligible = None
+        if filters:
+            selected = self.metadata[source_name].select(filters)
+            eligible = np.zeros(len(self.market_rows[source_name]), dtype=bool)
+            eligible[selected] = True
+            scores, rows = index.search_subset(query_embeddings, k, np.unique(self.market_rows[source_name][selected]))
+        elif exact:
+            scores, rows = index.search_exact(query_embeddings, k)
+        elif self.search_mode:
+            search = self.compressed[source_name] if source_name in self.compressed else self.build_compressed(source_name)
+            scores, rows = search.search(query_embeddings, k, self.embeddings[source_name])
+        else:
+            scores, rows = index.search(query_embeddings, k)
+        return self._markets_from_hits(source_name, scores, rows, k, eligible)
+
+    def compression_report(self, source_name='all_markets', headlines=None, k=10, sample_size=100):
+        """
+        Memory footprint and recall@k of every compressed mode against the exact scan.
+
+        Queries are the given headlines, or a random sample of stored market vectors.
+        """
+        # Copies the in-use rows; this is a diagnostic, not a serving path
+        vectors = np.asarray(self.embeddings[source_name][self.content_rows[source_name]])
+        if headlines:
+            queries = self.encode_queries(headlines)
+        else:
+            rng = np.random.default_rng(0)
+            queries = vectors[np.sort(rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False))]
+        return compression_report(vectors, queries, k=k, **self.search_params)
+
+    def find_similar_events(self, input_headline, k=3, threshold=0.4, exact=False, filters=None):
+        """
+        Top-k markets for a headline. `filters` restricts the search to eligible markets, e.g.
+        {'status': 'Active', 'source': ['Kalshi', 'Polymarket'], 'ends_within_days': 30,
+        'min_liquidity': 10000}; see METADATA_FILTERS in data/event_models.py.
+        """
+        # Sanitize and generate embedding for the input headline (cached for repeats)
+        input_embedding = self.encode_queries([input_headline])
+
+        # Approximate search, or an exact brute-force scan when requested
+        scores, ids = self.search('all_markets', input_embedding, k, exact, filters)
 
-        # Find top 3 most similar events with similarity score >= 0.4
-        similar_events = []
-        for i, score in enumerate(similarity_scores):
-            if score >= 0.4:
-                similar_events.append({
-                    'headline': self.data['all_markets'][i]['headline'],
-                    'market_id': self.data['all_markets'][i]['market_id'],
-                    'similarity_score': score
-                })
+        # Keep the top k most similar events with similarity score >= threshold
+        return self._results_from_hits('all_markets', scores[0], ids[0], threshold)
 
-        # Sort the results by similarity score in descending order
-        similar_events = sorted(similar_events, key=lambda x: x['similarity_score'], reverse=True)[:3]
+    def find_similar_events_batch(self, headlines, k=3, threshold=0.4, exact=True, filters=None):
+        """
+        Match several headlines at once, e.g. the three produced per stream chunk.
 
-        return similar_events
+        All uncached queries are encoded in one model call and, by default, scored with a
+        single matrix-matrix product over every market and a vectorized top-k: for a handful
+        of queries that beats the ANN index, whose IVF search probes its lists one query at
+        a time. Pass exact=False to go through the ANN index or compressed mode instead, as
+        find_similar_events does, and `filters` (as in find_similar_events) to score only
+        eligible markets.
 
-    async def match_events(self):
+        Returns one result list per headline, in input order.
+        """
+        if not headlines:
+            return []
+        query_embeddings = self.encode_queries(headlines)
+
+        scores, ids = self.search('all_markets', query_embeddings, k, exact, filters)
+
+        return [
+            self._results_from_hits('all_markets', row_scores, row_ids, threshold)
+            for row_scores, row_ids in zip(scores, ids)
+        ]
+
+    async def match_events(self, deltas=None):
+        # With `deltas` from a delta sync only the churned markets are written to the vector
+        # database; unchanged texts are served from the vector store either way
         print("Matching events")
         await self.initialize_redis()
         for source_name, file_path in self.data_sources.items():
-            data = self.load_json(file_path)
-            await self.generate_embeddings(source_name, data)
+            data = self.load_events(source_name)
+            upserted = await self.generate_embeddings(source_name, data)
+            if deltas:
+                await self.apply_deltas(source_name, deltas, upserted)
+            self.build_index(source_name)
+            if self.search_mode:
+                self.build_compressed(source_name)
 
         print("Event embeddings generated and cached.")
+
+    async def apply_updates(self, deltas, source_name='all_markets'):
+        """
+        Apply delta syncs to a source that is already matched, for long-running callers.
+
+        Instead of reloading and re-embedding the whole catalogue, only the delta's markets
+        are hashed and, if their text is new, encoded and appended to the vector store. The
+        event table, market rows and metadata index are patched, the ANN index (and compressed
+        search) gain and lose rows without re-training, and Redis and the vector database see
+        only the changed entries. Until the source is loaded this runs match_events instead.
+        """
+        if source_name not in self.data or source_name not in self.indexes:
+            return await self.match_events(deltas)
+        await self.initialize_redis()
+        store = self.open_vector_store(source_name)
+        data, old_rows = self.data[source_name], self.market_rows[source_name]
+        position = {(venue, str(market_id)): i
+                    for i, (venue, market_id) in enumerate(zip(data.column('source'), data.column('market_id')))}
+
+        # Changed markets are re-added at the end, closed ones just leave (as in apply_delta)
+        upserts = {(delta.venue, str(event['market_id'])): event for delta in deltas for event in delta.upserts()}
+        closed = [(delta.venue, str(market_id)) for delta in deltas for market_id in delta.closed]
+        keep = np.ones(len(data), dtype=bool)
+        keep[[position[key] for key in list(upserts) + closed if key in position]] = False
+
+        # Content hashes of the delta's markets only
+        texts, new_hashes, changed, markets_by_hash = {}, [], {}, {}
+        for key, event in upserts.items():
+            text = self.sanitize_sentence(event['headline'])
+            h = self.content_hash(text)
+            texts[h] = text
+            new_hashes.append(h)
+            if key not in position or store.keys[old_rows[position[key]]] != h:
+                changed[self.market_key(*key)] = h
+                markets_by_hash.setdefault(h, []).append(event)
+        removed = [self.market_key(*key) for key in closed if key in position]
+
+        await self.write_vectors(source_name, store, texts, markets_by_hash)
+        await self.apply_deltas(source_name, deltas, set(changed))
+
+        old_content = self.content_rows[source_name]
+        table = data.take(np.flatnonzero(keep))
+        if upserts:
+            table = EventTable.concat([table, EventTable.from_events(list(upserts.values()))])
+        self.data[source_name] = table
+        self.metadata[source_name] = MetadataIndex(table)
+        matrix, rows = store.view(new_hashes)
+        self.set_rows(source_name, matrix, np.concatenate([old_rows[keep], rows]))
+        added = np.setdiff1d(self.content_rows[source_name], old_content)
+        dropped = np.setdiff1d(old_content, self.content_rows[source_name])
+
+        await self.commit_content_map(source_name, changed, removed, {store.keys[row] for row in dropped})
+        self.update_index(source_name, added, dropped)
+        print(f"Applied {len(upserts)} upserts and {len(removed)} closures to '{source_name}'.")
         
 async def main():
     matcher = EventMatcher()
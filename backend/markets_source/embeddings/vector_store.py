@@ -0,0 +1,142 @@
+import json
+import os
+import numpy as np
+
+
+class MmapVectorStore:
+    """
+    Append-only embedding store on local disk.
+
+    Vectors live in `<name>.f32`, a headerless row-major little-endian float32 matrix that is
+    opened with np.memmap, so several worker processes reading the same store share the
+    same page-cache pages. `<name>.keys` holds one key per line; line N is the key for
+    row N and a later line for the same key supersedes earlier rows. `<name>.meta.json`
+    records the dimension.
+
+    A single writer appends rows; readers call `refresh()` to pick up appended rows.
+    """
+
+    def __init__(self, directory, name, dim=None):
+        self.directory = directory
+        self.name = name
+        self.matrix_path = os.path.join(directory, f'{name}.f32')
+        self.keys_path = os.path.join(directory, f'{name}.keys')
+        self.meta_path = os.path.join(directory, f'{name}.meta.json')
+        self.dim = dim
+        self.keys = []
+        self.rows = {}
+        self.matrix = None
+        self._keys_size = 0
+        self.open()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        # Keys round-trip through a text file, so ids like PredictIt's ints are compared as str
+        return str(key) in self.rows
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r', encoding='utf-8') as file:
+                stored_dim = json.load(file)['dim']
+            if self.dim is not None and self.dim != stored_dim:
+                raise ValueError(f"Vector store {self.matrix_path} has dimension {stored_dim}, expected {self.dim}.")
+            self.dim = stored_dim
+        self.keys = []
+        self.rows = {}
+        self._keys_size = 0
+        self.refresh()
+
+    def refresh(self):
+        """Pick up rows appended since the store was opened (cheap when nothing changed)."""
+        if not os.path.exists(self.keys_path):
+            self.matrix = None
+            return
+        size = os.path.getsize(self.keys_path)
+        if size == self._keys_size and self.matrix is not None:
+            return
+        with open(self.keys_path, 'rb') as file:
+            file.seek(self._keys_size)
+            chunk = file.read()
+        # Ignore a trailing partial line from an in-progress append
+        complete, newline, _ = chunk.rpartition(b'\n')
+        if newline:
+            for key in complete.decode('utf-8').split('\n'):
+                self.rows[key] = len(self.keys)
+                self.keys.append(key)
+            self._keys_size += len(complete) + 1
+        self._map()
+
+    def _map(self):
+        if not self.keys or not self.dim:
+            self.matrix = None
+            return
+        self.matrix = np.memmap(self.matrix_path, dtype='<f4', mode='r', shape=(len(self.keys), self.dim))
+
+    def _truncate_torn_rows(self):
+        # A crash between writing vectors and keys leaves unreferenced bytes at the end
+        expected = len(self.keys) * (self.dim or 0) * 4
+        if os.path.exists(self.matrix_path) and os.path.getsize(self.matrix_path) > expected:
+            with open(self.matrix_path, 'r+b') as file:
+                file.truncate(expected)
+
+    def append(self, keys, vectors):
+        """Append rows for `keys` without rewriting existing data."""
+        vectors = np.ascontiguousarray(vectors, dtype='<f4')
+        if len(keys) != len(vectors):
+            raise ValueError("keys and vectors must have the same length.")
+        if not len(keys):
+            return
+        if any('\n' in str(key) for key in keys):
+            raise ValueError("Vector store keys must not contain newlines.")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            with open(self.meta_path, 'w', encoding='utf-8') as file:
+                json.dump({'dim': self.dim, 'dtype': 'float32'}, file)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Vectors have dimension {vectors.shape[1]}, expected {self.dim}.")
+
+        self.refresh()
+        self._truncate_torn_rows()
+        # Vectors first, then keys: rows only become visible once their key is written
+        with open(self.matrix_path, 'ab') as file:
+            file.write(vectors.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        with open(self.keys_path, 'a', encoding='utf-8') as file:
+            file.write(''.join(f'{key}\n' for key in keys))
+        self.refresh()
+
+    def rows_for(self, keys):
+        """Row number for each key, -1 where the key is not stored."""
+        return np.array([self.rows.get(str(key), -1) for key in keys], dtype=np.int64)
+
+    def view(self, keys):
+        """
+        (matrix, rows): the whole memory-mapped matrix plus the row of each key, so callers
+        read `matrix[rows[i]]` for key i without copying anything. Keys may repeat (e.g.
+        markets sharing a headline) and map to the same row.
+        """
+        rows = self.rows_for(keys)
+        if (rows < 0).any():
+            missing = [key for key, row in zip(keys, rows) if row < 0]
+            raise KeyError(f"{len(missing)} keys are not in the vector store, e.g. {missing[0]!r}")
+        matrix = self.matrix if self.matrix is not None else np.empty((0, self.dim or 0), dtype=np.float32)
+        return matrix, rows
+
+    def get(self, keys):
+        """
+        Matrix of vectors for `keys` in the given order.
+
+        When the rows form one contiguous ascending run (the common case for a store
+        written in catalogue order) this is a zero-copy view of the memory map; otherwise
+        the rows are copied, so use `view` for anything catalogue-sized.
+        """
+        matrix, rows = self.view(keys)
+        if not len(rows):
+            return matrix[:0]
+        if (np.diff(rows) == 1).all():
+            return matrix[rows[0]:rows[-1] + 1]
+        return np.asarray(matrix[rows])
@@ -1,59 +1,240 @@
+import argparse
 import asyncio
 import os
 import json
+from storage import STORAGE_DIR
 from data.kalshi_client import KalshiClient
 from data.polymarket_api import PolymarketAPI
 from data.predictit_api import PredictItAPI
+from data.futuur_api import FutuurAPI
+from data.http_client import close_shared_client
+from data.delta_sync import DeltaSync, MarketDelta, apply_delta
+from data.snapshot import SnapshotWriter, load_events, load_table
+from data.event_models import EventTable
 from embeddings.similarity import EventMatcher
 
-async def main():
-    # Initialize API clients
-    kalshi_client = KalshiClient()
-    polymarket_client = PolymarketAPI()
-    predictit_client = PredictItAPI()
-    
-    # Fetch events from each API
-    print("Fetching Kalshi events...")
-    kalshi_events = kalshi_client.fetch_markets()
-    print(f"Fetched {len(kalshi_events)} Kalshi events.")
-
-    print("Fetching Polymarket events...")
-    polymarket_events = polymarket_client.fetch_markets()
-    print(f"Fetched {len(polymarket_events)} Polymarket events.")
-
-    print("Fetching PredictIt events...")
-    predictit_events = predictit_client.fetch_markets()
-    print(f"Fetched {len(predictit_events)} PredictIt events.")
-
-    # Combine all events into one list
-    all_events = kalshi_events + polymarket_events + predictit_events
-    print(f"Total events collected: {len(all_events)}")
-
-    # Define the storage path
-    storage_folder = os.path.join(os.getcwd(), 'backend\markets_source\storage')
-    os.makedirs(storage_folder, exist_ok=True)
+# Per-venue time budget in seconds; Kalshi walks cursor pages so it gets the most
+VENUE_TIMEOUTS = {"Kalshi": 120, "Polymarket": 60, "PredictIt": 60, "Futuur": 60}
+
+
+async def fetch_venue(name, client, timeout):
+    # None (rather than []) tells callers the venue failed, so delta sync doesn't mark it closed
+    try:
+        events = await asyncio.wait_for(client.fetch_markets_async(), timeout)
+        print(f"Fetched {len(events)} {name} events.")
+        return events
+    except asyncio.TimeoutError:
+        print(f"Timed out fetching {name} events after {timeout}s, skipping.")
+    except Exception as e:
+        print(f"Failed to fetch {name} events: {e}")
+    return None
+
+
+async def fetch_all_venues(clients, timeouts=None):
+    """Fetch every venue concurrently; a slow or failing venue maps to None."""
+    timeouts = timeouts or VENUE_TIMEOUTS
+    print(f"Fetching {', '.join(clients)} events...")
+    try:
+        results = await asyncio.gather(*[
+            fetch_venue(name, client, timeouts.get(name, 60)) for name, client in clients.items()
+        ])
+    finally:
+        await close_shared_client()
+    return dict(zip(clients, results))
+
+
+def storage_paths():
+    """(legacy JSON catalogue, snapshot root, checkpoint directory) under the storage folder."""
+    # The same folder EventMatcher reads from, whatever the working directory
     combined_filename = 'AllMarketsEvents.json'
-    combined_filepath = os.path.join(storage_folder, combined_filename)
+    combined_filepath = os.path.join(STORAGE_DIR, combined_filename)
+    return combined_filepath, os.path.join(STORAGE_DIR, 'snapshots'), os.path.join(STORAGE_DIR, 'checkpoints')
+
+
+def load_catalogue(snapshot_root, json_path):
+    # Latest snapshot, or the legacy JSON catalogue on the first run after upgrading
+    events = load_events(snapshot_root)
+    if events is not None:
+        return events
+    if not os.path.exists(json_path):
+        return []
+    with open(json_path, 'r', encoding='utf-8') as jsonfile:
+        return json.load(jsonfile)
 
-    # Convert all events to dictionaries
+
+def save_catalogue(snapshot_root, events_by_venue):
+    """Stream the catalogue into a new Parquet snapshot, one venue at a time."""
     try:
-        data_to_save = [event.to_dict() for event in all_events]
-    except AttributeError as e:
-        print(f"Error converting events to dict: {e}")
-        return
+        with SnapshotWriter(snapshot_root) as writer:
+            for events in events_by_venue.values():
+                writer.write(events)
+        print(f"Successfully saved {writer.rows} events to snapshot {writer.snapshot_id} in {snapshot_root}")
+        return True
+    except Exception as e:
+        print(f"Failed to save events: {e}")
+        return False
+
+
+async def venue_pages(client):
+    # Paginated venues stream their pages; single-request venues yield their listing as one page
+    if hasattr(client, 'aiter_market_pages'):
+        async for page in client.aiter_market_pages():
+            yield page
+    else:
+        yield await client.fetch_markets_async()
+
+
+def carry_forward(name, writer):
+    """Copy the venue's partition of the current snapshot into `writer`; returns the rows copied."""
+    previous = load_table(writer.root, sources=[name])
+    if not previous:
+        return 0
+    writer.write(previous)
+    return len(previous)
+
+
+async def stream_venue(name, client, writer, timeout):
+    """
+    Write a venue's pages into `writer` as they arrive and return the fingerprints of its
+    listing. A venue that fails, times out or lists nothing has its rows discarded and its
+    markets from the previous snapshot carried over, and returns None so its checkpoint is
+    left alone. With no previous markets to carry it returns {}: the venue is absent from
+    the new snapshot, so its checkpoint must be emptied too.
+    """
+    fingerprints = {}
+
+    async def walk():
+        async for page in venue_pages(client):
+            writer.write(page)
+            # Fingerprint table rows, the same form the delta path and the scheduler hash
+            fingerprints.update(DeltaSync.fingerprints(EventTable.from_events(page)))
 
-    # Save the combined events to a single JSON file
     try:
-        with open(combined_filepath, 'w', encoding='utf-8') as jsonfile:
-            json.dump(data_to_save, jsonfile, ensure_ascii=False, indent=4)
-        print(f"Successfully saved {len(data_to_save)} events to {combined_filepath}")
+        await asyncio.wait_for(walk(), timeout)
+        if fingerprints:
+            print(f"Streamed {len(fingerprints)} {name} events.")
+            return fingerprints
+        print(f"No {name} events fetched, skipping.")
+    except asyncio.TimeoutError:
+        print(f"Timed out fetching {name} events after {timeout}s, skipping.")
+    except Exception as e:
+        print(f"Failed to fetch {name} events: {e}")
+    writer.discard(name)
+    carried = carry_forward(name, writer)
+    if carried:
+        print(f"Keeping {carried} {name} events from the previous snapshot.")
+        return None
+    return {}
+
+
+async def stream_full_snapshot(clients, snapshot_root, timeouts=None):
+    """
+    Full refresh: stream every venue concurrently into one new snapshot, each into its own
+    source partition, so pages are written while later ones are still downloading.
+    Returns {venue: fingerprints} for the venues whose checkpoint should move (see
+    stream_venue), or None if nothing was saved.
+    """
+    timeouts = timeouts or VENUE_TIMEOUTS
+    print(f"Streaming {', '.join(clients)} events into a new snapshot...")
+    try:
+        with SnapshotWriter(snapshot_root) as writer:
+            results = await asyncio.gather(*[
+                stream_venue(name, client, writer, timeouts.get(name, 60)) for name, client in clients.items()
+            ])
+            if not any(results):
+                raise RuntimeError("no venue returned any events")
     except Exception as e:
         print(f"Failed to save events: {e}")
-        return
+        return None
+    finally:
+        await close_shared_client()
+    print(f"Successfully saved {writer.rows} events to snapshot {writer.snapshot_id} in {snapshot_root}")
+    return {name: fingerprints for name, fingerprints in zip(clients, results) if fingerprints is not None}
+
 
-# Proceed with event matching if necessary
+async def main(full_refresh=False):
+    # Initialize API clients
+    clients = {
+        "Kalshi": KalshiClient(),
+        "Polymarket": PolymarketAPI(),
+        "PredictIt": PredictItAPI(),
+    }
+    futuur = FutuurAPI()
+    if futuur.configured:
+        # Futuur requests are signed, so it only joins when API keys are set
+        clients["Futuur"] = futuur
+
+    combined_filepath, snapshot_root, checkpoint_dir = storage_paths()
+    sync = DeltaSync(checkpoint_dir)
+
+    deltas = None
+    if full_refresh:
+        previous = {venue: sync.load(venue) for venue in clients}
+        fingerprints = await stream_full_snapshot(clients, snapshot_root)
+        if fingerprints is None:
+            return
+        # Markets checkpointed before but missing from the new listing closed in between;
+        # their vector documents go the same way as in a delta run
+        deltas = []
+        for venue, venue_fingerprints in fingerprints.items():
+            closed = [market_id for market_id in previous[venue] if market_id not in venue_fingerprints]
+            if closed:
+                deltas.append(MarketDelta(venue, closed=closed))
+                print(f"Full refresh {deltas[-1].summary()}")
+    else:
+        # Fetch events from all APIs at once over the shared connection pool
+        events_by_venue = await fetch_all_venues(clients)
+
+        # Convert each venue's events to a columnar EventTable
+        try:
+            events_by_venue = {
+                venue: EventTable.from_events(events) if events is not None else None
+                for venue, events in events_by_venue.items()
+            }
+        except AttributeError as e:
+            print(f"Error converting events to dict: {e}")
+            return
+
+        # Delta sync: only markets added, changed or closed since each venue's checkpoint
+        data_to_save = load_catalogue(snapshot_root, combined_filepath)
+        deltas = []
+        synced_venues = []
+        for venue, events in events_by_venue.items():
+            if not events:
+                # A failed or empty fetch would look like every market closed; keep the checkpoint
+                print(f"No {venue} events fetched, keeping its previous markets.")
+                continue
+            delta = sync.diff(venue, events)
+            print(f"Delta sync {delta.summary()}")
+            synced_venues.append(venue)
+            if delta:
+                data_to_save = apply_delta(data_to_save, delta)
+                deltas.append(delta)
+        if not deltas:
+            print("No market changes since the last sync.")
+            return
+        print(f"Total events in catalogue: {len(data_to_save)}")
+
+        # Save the combined events as a columnar snapshot partitioned by source and date
+        if not save_catalogue(snapshot_root, {"all": data_to_save}):
+            return
+
+    # Proceed with event matching if necessary
     matcher = EventMatcher()
-    await matcher.match_events()
+    await matcher.match_events(deltas)
+
+    # Checkpoints only move forward once the delta is both on disk and applied by the matcher;
+    # if matching raises they stay put and the next run re-emits the same delta
+    if full_refresh:
+        for venue, venue_fingerprints in fingerprints.items():
+            sync.commit_fingerprints(venue, venue_fingerprints)
+    else:
+        for venue in synced_venues:
+            sync.commit(venue, events_by_venue[venue])
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Fetch markets from every venue and embed them.")
+    parser.add_argument("--full", action="store_true",
+                        help="Rewrite the whole catalogue instead of applying per-venue deltas.")
+    args = parser.parse_args()
+    asyncio.run(main(full_refresh=args.full))
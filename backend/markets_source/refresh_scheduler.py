@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import math
+import time
+import numpy as np
+from data.kalshi_client import KalshiClient
+from data.polymarket_api import PolymarketAPI
+from data.predictit_api import PredictItAPI
+from data.futuur_api import FutuurAPI
+from data.http_client import RateLimiter, close_shared_client
+from data.delta_sync import DeltaSync, apply_delta
+from data.event_models import EventTable
+from embeddings.similarity import EventMatcher
+from fetch_embed_events import VENUE_TIMEOUTS, fetch_venue, load_catalogue, save_catalogue, storage_paths
+
+# Poll interval bounds in seconds and the poll quota (token bucket) for each venue
+VENUE_SCHEDULES = {
+    "Kalshi": {"interval": 120, "min_interval": 30, "max_interval": 1800, "polls_per_minute": 2},
+    "Polymarket": {"interval": 120, "min_interval": 30, "max_interval": 1800, "polls_per_minute": 2},
+    "PredictIt": {"interval": 300, "min_interval": 60, "max_interval": 3600, "polls_per_minute": 1},
+    "Futuur": {"interval": 300, "min_interval": 60, "max_interval": 3600, "polls_per_minute": 1},
+}
+
+
+class MarketPriority:
+    """
+    Priority of every market seen so far, from liquidity, time to expiry and recent price
+    volatility (an exponentially weighted mean of absolute yes_ask moves between polls).
+
+    A venue's `activity` for one poll is the share of its total priority carried by the
+    markets that changed, so a move in a liquid market about to expire counts for much
+    more than a tweak to a dormant long-dated one.
+    """
+
+    def __init__(self, alpha=0.3, expiry_days=7.0, volatility_weight=10.0):
+        self.alpha = alpha
+        self.expiry_days = expiry_days
+        self.volatility_weight = volatility_weight
+        self.last_price = {}
+        self.volatility = {}
+        self.scores = {}
+
+    def update(self, table, now=None):
+        """Fold one poll's EventTable into the volatility estimates and rescore its markets."""
+        now = now or time.time()
+        market_ids = [str(market_id) for market_id in table.column('market_id')]
+        prices = table.column('yes_ask')
+        volatility = np.empty(len(market_ids))
+        for row, (market_id, price) in enumerate(zip(market_ids, prices)):
+            previous = self.last_price.get(market_id)
+            vol = self.volatility.get(market_id, 0.0)
+            if previous is not None and not math.isnan(price) and not math.isnan(previous):
+                vol = (1 - self.alpha) * vol + self.alpha * abs(price - previous)
+            self.last_price[market_id] = price
+            self.volatility[market_id] = volatility[row] = vol
+
+        liquidity = np.log1p(np.nan_to_num(np.maximum(table.column('liquidity'), 0.0)))
+        days_left = (table.column('end_ts') - now) / 86400.0
+        # Markets closing soon weigh more; unknown end dates get a small constant weight
+        expiry = np.where(np.isnan(days_left), 0.1, 1.0 / (1.0 + np.maximum(np.nan_to_num(days_left), 0.0) / self.expiry_days))
+        scores = (1.0 + liquidity) * (0.5 + expiry) * (1.0 + self.volatility_weight * volatility)
+        self.scores.update(zip(market_ids, scores.tolist()))
+        return dict(zip(market_ids, scores.tolist()))
+
+    def forget(self, market_ids):
+        """Drop the state of markets that are no longer listed, so it doesn't grow with every market ever seen."""
+        for market_id in market_ids:
+            market_id = str(market_id)
+            self.last_price.pop(market_id, None)
+            self.volatility.pop(market_id, None)
+            self.scores.pop(market_id, None)
+
+    def activity(self, delta, scores):
+        total = sum(scores.values())
+        if not total:
+            return 0.0
+        moved = [str(event['market_id']) for event in delta.upserts()] + [str(market_id) for market_id in delta.closed]
+        return sum(self.scores.get(market_id, 0.0) for market_id in moved) / total
+
+
+class VenuePoller:
+    """
+    Poll timing for one venue.
+
+    Polls draw from a token bucket of `polls_per_minute`. After each poll the interval
+    adapts multiplicatively: it halves (down to `min_interval`) when the venue's activity
+    reaches `target_activity` and grows by `backoff` (up to `max_interval`) when it's quiet.
+    """
+
+    def __init__(self, name, client, interval, min_interval, max_interval, polls_per_minute,
+                 target_activity=0.01, backoff=1.5):
+        self.name = name
+        self.client = client
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_activity = target_activity
+        self.backoff = backoff
+        self.bucket = RateLimiter(polls_per_minute / 60.0, burst=1)
+        self.fingerprints = None
+
+    def adapt(self, activity):
+        if activity >= self.target_activity:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return self.interval
+
+
+class RefreshScheduler:
+    """
+    Long-running replacement for the one-shot fetch_embed_events.main.
+
+    Every venue polls on its own adaptive interval. Polls only update in-memory state, and
+    a flush every `flush_interval` seconds turns the latest listing of each polled venue
+    into an exact delta against its on-disk checkpoint. The flush then saves a snapshot
+    (older ones are pruned, see data/snapshot.py), hands the deltas to the matcher and only
+    then moves the checkpoints. The matcher is loaded once and afterwards patched
+    incrementally (EventMatcher.apply_updates), so the work done is proportional to what
+    moved since the last flush, however many polls happened.
+    """
+
+    def __init__(self, clients, schedules=None, flush_interval=60, matcher=None):
+        schedules = schedules or VENUE_SCHEDULES
+        self.pollers = [VenuePoller(name, client, **schedules[name]) for name, client in clients.items()]
+        self.flush_interval = flush_interval
+        self.matcher = matcher
+        self.priority = MarketPriority()
+        self.latest = {}
+        self.lock = asyncio.Lock()
+        self.combined_filepath, self.snapshot_root, checkpoint_dir = storage_paths()
+        self.sync = DeltaSync(checkpoint_dir)
+        self.catalogue = load_catalogue(self.snapshot_root, self.combined_filepath)
+
+    async def poll(self, poller):
+        await poller.bucket.acquire()
+        events = await fetch_venue(poller.name, poller.client, VENUE_TIMEOUTS.get(poller.name, 60))
+        if not events:
+            # A failed poll says nothing about activity; retry on the current interval
+            return
+        table = EventTable.from_events(events)
+        scores = self.priority.update(table)
+        if poller.fingerprints is None:
+            poller.fingerprints = self.sync.load(poller.name)
+        # Activity is measured poll-over-poll; what gets persisted is decided at flush time
+        delta = self.sync.diff(poller.name, table, previous=poller.fingerprints)
+        poller.fingerprints = self.sync.fingerprints(table)
+        activity = self.priority.activity(delta, scores)
+        self.priority.forget(delta.closed)
+        interval = poller.adapt(activity)
+        print(f"{poller.name}: {delta.summary()}, activity {activity:.3f}, next poll in {interval:.0f}s")
+        async with self.lock:
+            self.latest[poller.name] = table
+
+    async def poll_loop(self, poller):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll(poller)
+            except Exception as e:
+                print(f"Poll of {poller.name} failed: {e}")
+            await asyncio.sleep(max(0.0, poller.interval - (time.monotonic() - started)))
+
+    async def flush(self):
+        async with self.lock:
+            latest, self.latest = self.latest, {}
+        deltas = []
+        for venue, table in latest.items():
+            delta = self.sync.diff(venue, table)
+            if delta:
+                self.catalogue = apply_delta(self.catalogue, delta)
+                deltas.append(delta)
+        if not deltas:
+            return
+        print(f"Flushing {', '.join(delta.summary() for delta in deltas)}")
+        if not save_catalogue(self.snapshot_root, {"all": self.catalogue}):
+            # Keep the listings so the next flush retries them
+            async with self.lock:
+                self.latest = {**latest, **self.latest}
+            return
+        if self.matcher is None:
+            self.matcher = EventMatcher()
+        try:
+            await self.matcher.apply_updates(deltas)
+        except Exception:
+            # Checkpoints haven't moved, so diffing these listings again re-emits the same delta
+            async with self.lock:
+                self.latest = {**latest, **self.latest}
+            raise
+        for venue, table in latest.items():
+            self.sync.commit(venue, table)
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Flush failed: {e}")
+
+    async def run(self):
+        tasks = [asyncio.ensure_future(self.poll_loop(poller)) for poller in self.pollers]
+        tasks.append(asyncio.ensure_future(self.flush_loop()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await close_shared_client()
+
+
+async def main(flush_interval=60):
+    clients = {
+        "Kalshi": KalshiClient(),
+        "Polymarket": PolymarketAPI(),
+        "PredictIt": PredictItAPI(),
+    }
+    futuur = FutuurAPI()
+    if futuur.configured:
+        clients["Futuur"] = futuur
+    await RefreshScheduler(clients, flush_interval=flush_interval).run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continuously refresh venue markets on adaptive intervals.")
+    parser.add_argument("--flush-interval", type=float, default=60,
+                        help="Seconds between persisting and embedding the accumulated changes.")
+    args = parser.parse_args()
+    asyncio.run(main(flush_interval=args.flush_interval))
@@ -0,0 +1,5 @@
+import os
+
+# Root of everything the market pipeline writes: catalogue snapshots, delta checkpoints,
+# vector stores, indexes and caches. Derived from this file so it doesn't depend on the cwd.
+STORAGE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -0,0 +1,81 @@
+import os
+from abc import ABC, abstractmethod
+from storage import STORAGE_DIR
+
+
+class VectorBackend(ABC):
+    """
+    Interface shared by the vector database backends.
+
+    Documents are dictionaries with 'name', 'embedding' and optional 'metadata'
+    (source, status, end_date, liquidity). Stored documents are returned shaped like
+    the MongoDB ones: {'_id', 'name', 'embedding': {..., 'values'}, 'metadata'}.
+    """
+
+    @abstractmethod
+    def add_documents(self, documents):
+        """Insert documents and return their ids."""
+
+    @abstractmethod
+    def upsert_documents(self, documents, chunk_size=500, max_retries=3, retry_backoff=0.5):
+        """Insert or replace documents keyed by name; returns upserted/modified/failed counts."""
+
+    @abstractmethod
+    def read_document(self, doc_id=None, name=None):
+        """Return one stored document by id or name, or None."""
+
+    @abstractmethod
+    def find_similar_vectors(self, target_embedding, k=5, filters=None):
+        """Return the k stored documents most similar to the target embedding."""
+
+    @abstractmethod
+    def update_metadata(self, documents):
+        """Replace the metadata of existing documents ('name', 'metadata'), keeping their vectors; returns the number matched."""
+
+    @abstractmethod
+    def delete_document(self, doc_id=None, name=None):
+        """Delete one document by id or name and return the number deleted."""
+
+    @abstractmethod
+    def delete_documents(self, names):
+        """Delete documents by name in batches and return the number deleted."""
+
+    def add_document(self, name, embedding, metadata=None):
+        """Insert or replace the embedding stored under `name`."""
+        document = {'name': name, 'embedding': embedding}
+        if metadata is not None:
+            document['metadata'] = metadata
+        return self.upsert_documents([document])
+
+
+def open_vector_database(backend=None, asynchronous=False, **options):
+    """
+    Open the configured vector database backend.
+
+    `backend` defaults to the VECTOR_DB_BACKEND environment variable:
+    - 'mongo' (default): remote MongoDB from MONGO_URI / MONGO_CERT_FILE
+    - 'embedded': single-node SQLite + memory-mapped vector file under VECTOR_DB_PATH
+      (default storage/vectordb), with no network round trips
+    With `asynchronous=True` the mongo backend is the pooled AsyncVectorDatabase, whose
+    methods are coroutines (pool size from MONGO_MAX_POOL_SIZE), or the synchronous
+    VectorDatabase when motor isn't installed. The embedded backend has no network I/O
+    and is always synchronous.
+    Extra keyword options are passed to the backend's constructor.
+    """
+    backend = (backend or os.getenv("VECTOR_DB_BACKEND", "mongo")).lower()
+    if backend == 'mongo':
+        options.setdefault('vector_format', os.getenv("MONGO_VECTOR_FORMAT", "list"))
+        if asynchronous:
+            from storage.db import AsyncVectorDatabase, AsyncIOMotorClient
+            if AsyncIOMotorClient is not None:
+                options.setdefault('max_pool_size', int(os.getenv("MONGO_MAX_POOL_SIZE", "20")))
+                return AsyncVectorDatabase(os.getenv("MONGO_URI"), os.getenv("MONGO_CERT_FILE"), **options)
+            # Callers handle both clients (see EventMatcher.call_vector_db), so run on the threaded one
+            print("motor is not installed (pip install motor); using the synchronous MongoDB client.")
+        from storage.db import VectorDatabase
+        return VectorDatabase(os.getenv("MONGO_URI"), os.getenv("MONGO_CERT_FILE"), **options)
+    if backend == 'embedded':
+        from storage.embedded_db import EmbeddedVectorDatabase
+        default_path = os.path.join(STORAGE_DIR, 'vectordb')
+        return EmbeddedVectorDatabase(os.getenv("VECTOR_DB_PATH", default_path), **options)
+    raise ValueError(f"Unknown vector database backend '{backend}'. Expected 'mongo' or 'embedded'.")
@@ -1,9 +1,96 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 from bson.objectid import ObjectId
+from itertools import islice
+import asyncio
 import numpy as np
+import time
+from storage.backends import VectorBackend
 
-class VectorDatabase:
-    def __init__(self, uri, tls_cert_file):
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:  # motor is only needed by AsyncVectorDatabase
+    AsyncIOMotorClient = None
+from storage.vector_mirror import VectorMirror
+from storage.vector_codec import encode_values, decode_values
+from data.event_models import METADATA_FILTERS, end_date_bounds
+
+METADATA_FIELDS = ("source", "status", "end_date", "liquidity")
+
+
+def metadata_query(filters, now=None):
+    """Translate keyword filters (see METADATA_FILTERS) into a MongoDB query on the stored metadata."""
+    unknown = set(filters) - set(METADATA_FILTERS)
+    if unknown:
+        raise ValueError(f"Unknown filters {sorted(unknown)}. Expected any of {METADATA_FILTERS}.")
+    query = {}
+    for field in ("source", "status"):
+        wanted = filters.get(field)
+        if wanted is not None:
+            query[f"metadata.{field}"] = wanted if isinstance(wanted, str) else {"$in": list(wanted)}
+
+    after, before = end_date_bounds(filters, now)
+    end_range = {}
+    if after is not None:
+        end_range["$gte"] = after
+    if before is not None:
+        end_range["$lte"] = before
+    if end_range:
+        query["metadata.end_date"] = end_range
+
+    liquidity_range = {}
+    if filters.get('min_liquidity') is not None:
+        liquidity_range["$gte"] = filters['min_liquidity']
+    if filters.get('max_liquidity') is not None:
+        liquidity_range["$lte"] = filters['max_liquidity']
+    if liquidity_range:
+        query["metadata.liquidity"] = liquidity_range
+    return query
+
+
+class MongoDocuments:
+    """Document layout shared by the sync and async MongoDB clients."""
+    vector_format = 'list'
+
+    def _to_mongo_document(self, name, embedding, metadata=None):
+        document = self._embedding_document(name, embedding)
+        if metadata is not None:
+            document["metadata"] = metadata
+        return document
+
+    def _embedding_document(self, name, embedding):
+        # vector_version changes with every vector write, so VectorMirror.reconcile can spot
+        # replaced vectors from ids and versions alone
+        return {
+            "name": name,
+            "vector_version": ObjectId(),
+            "embedding": {
+                "type": "vector",
+                "path": "embedding",
+                "numDimensions": 4096,
+                "similarity": "cosine",
+                **encode_values(embedding, self.vector_format)
+            }
+        }
+
+    def _upsert_operation(self, doc):
+        if len(doc['embedding']) != 4096:
+            raise ValueError("Each embedding must be 4096-dimensional.")
+        return UpdateOne(
+            {"name": doc['name']},
+            {"$set": self._to_mongo_document(doc['name'], doc['embedding'], doc.get('metadata'))},
+            upsert=True
+        )
+
+    @staticmethod
+    def _metadata_operation(doc):
+        # Leaves the vector (and its vector_version) alone; never creates a vectorless document
+        return UpdateOne({"name": doc['name']}, {"$set": {"metadata": doc['metadata']}})
+
+
+class VectorDatabase(MongoDocuments, VectorBackend):
+    def __init__(self, uri, tls_cert_file, use_mirror=True, use_change_stream=True, vector_format='list',
+                 reconcile_interval=300):
         self.client = MongoClient(
             uri,
             tls=True,
@@ -12,6 +99,18 @@ class VectorDatabase:
         self.db = self.client['quavadb']
         self.collection = self.db['pussy']
 
+        # Local float32 mirror of the collection used by find_similar_vectors; created lazily
+        # on the first search and synced incrementally before every search (see VectorMirror)
+        self.use_mirror = use_mirror
+        self.use_change_stream = use_change_stream
+        self.reconcile_interval = reconcile_interval
+        self.mirror = None
+        self._name_index_ready = False
+
+        # How new embeddings are written: 'list' (BSON doubles), or packed 'float32'/'float16'
+        # BSON binary. Readers accept both, see storage/migrate_vectors.py to convert old documents.
+        self.vector_format = vector_format
+
     def add_documents(self, documents):
         """
         Add multiple documents with embeddings to the MongoDB collection.
@@ -28,23 +127,78 @@ class VectorDatabase:
                 raise ValueError("Each embedding must be 4096-dimensional.")
 
         # Create an array of documents to insert into MongoDB
-        mongo_documents = []
-        for doc in documents:
-            mongo_documents.append({
-                "name": doc['name'],
-                "embedding": {
-                    "type": "vector",
-                    "path": "embedding",
-                    "numDimensions": 4096,
-                    "similarity": "cosine",
-                    "values": doc['embedding']
-                }
-            })
+        mongo_documents = [self._to_mongo_document(doc['name'], doc['embedding']) for doc in documents]
 
         # Use insert_many to insert all documents at once
         insert_result = self.collection.insert_many(mongo_documents)
         return insert_result.inserted_ids
 
+    def upsert_documents(self, documents, chunk_size=500, max_retries=3, retry_backoff=0.5):
+        """
+        Insert or replace many embeddings keyed by document name.
+
+        Args:
+        - documents: An iterable of dictionaries with 'name', 'embedding' and optionally
+          'metadata' (source, status, end_date, liquidity) used by filtered searches. It is
+          consumed lazily, one chunk at a time, so at most `chunk_size` documents are held in memory.
+        - chunk_size: Number of upserts sent per unordered bulk_write.
+        - max_retries: Attempts per chunk on transient errors; upserts are idempotent, so a
+          retried chunk never duplicates documents.
+        - retry_backoff: Initial sleep between attempts, doubled after every failure.
+
+        Returns:
+        - A dict with 'upserted', 'modified' and 'failed' document counts.
+        """
+        if not self._name_index_ready:
+            # Upserts match on name, so make that lookup an index seek; the metadata indexes
+            # serve the prefilter of find_similar_vectors
+            self.collection.create_index("name")
+            for field in METADATA_FIELDS:
+                self.collection.create_index(f"metadata.{field}")
+            self._name_index_ready = True
+
+        stats = {'upserted': 0, 'modified': 0, 'failed': 0}
+        documents = iter(documents)
+        while True:
+            chunk = list(islice(documents, chunk_size))
+            if not chunk:
+                break
+            operations = [self._upsert_operation(doc) for doc in chunk]
+
+            for attempt in range(max_retries):
+                try:
+                    result = self.collection.bulk_write(operations, ordered=False)
+                    stats['upserted'] += result.upserted_count
+                    stats['modified'] += result.modified_count
+                    self._update_mirror(chunk, result.upserted_ids)
+                    break
+                except (BulkWriteError, PyMongoError) as e:
+                    if attempt == max_retries - 1:
+                        print(f"Failed to upsert chunk of {len(chunk)} documents after {max_retries} attempts: {e}")
+                        stats['failed'] += len(chunk)
+                    else:
+                        time.sleep(retry_backoff * (2 ** attempt))
+        return stats
+
+    def _update_mirror(self, chunk, upserted_ids):
+        # New documents reach the mirror on its next sync; replaced vectors keep their
+        # ObjectId, so apply those locally instead of waiting for a full resync
+        if self.mirror is None:
+            return
+        for i, doc in enumerate(chunk):
+            if i not in upserted_ids:
+                self.mirror.update_by_name(doc['name'], doc['embedding'])
+
+    def update_metadata(self, documents, chunk_size=500):
+        """Set the metadata of existing documents ('name', 'metadata') without rewriting their vectors."""
+        matched = 0
+        documents = iter(documents)
+        while True:
+            chunk = list(islice(documents, chunk_size))
+            if not chunk:
+                break
+            matched += self.collection.bulk_write([self._metadata_operation(doc) for doc in chunk], ordered=False).matched_count
+        return matched
 
     def read_document(self, doc_id=None, name=None):
         query = {}
@@ -57,30 +211,53 @@ class VectorDatabase:
         
         return self.collection.find_one(query)
 
-    def find_similar_vectors(self, target_embedding):
-        """Find documents with embeddings similar to the target using a brute-force approach."""
-        # Ensure the target embedding is 1536-dimensional
+    def find_similar_vectors(self, target_embedding, k=5, filters=None):
+        """
+        Find the k documents whose embeddings are most similar to the target.
+
+        Searches run against the local mirror, which only pulls new or changed documents
+        from MongoDB; only the top-k documents themselves are fetched over the network.
+        `filters` (source, status, ends_within_days, ends_after, ends_before, min_liquidity,
+        max_liquidity) are resolved to eligible ids with an indexed, ids-only query first,
+        so only those vectors are scored.
+        """
         if len(target_embedding) != 4096:
-            raise ValueError("Target embedding must be 1536-dimensional.")
-
-        # Retrieve all documents from the collection
-        all_documents = list(self.collection.find({}))
-
-        # Compute cosine similarities
-        similarities = []
-        for doc in all_documents:
-            # Access the 'values' field of the embedding dictionary
-            embedding = np.array(doc['embedding']['values'])  # Extracting values from the dictionary
-            # Calculate cosine similarity
-            similarity = np.dot(embedding, target_embedding) / (np.linalg.norm(embedding) * np.linalg.norm(target_embedding))
-            similarities.append((doc, similarity))
-        
-        # Sort by similarity
-        similar_docs = sorted(similarities, key=lambda x: x[1], reverse=True)
+            raise ValueError("Target embedding must be 4096-dimensional.")
+
+        query = metadata_query(filters) if filters else None
+        if not self.use_mirror:
+            return self._find_similar_vectors_scan(target_embedding, k, query)
 
-        # Return the top N similar documents (e.g., top 5)
-        return [doc for doc, _ in similar_docs[:5]]
+        if self.mirror is None:
+            self.mirror = VectorMirror(self.collection, dim=4096, use_change_stream=self.use_change_stream,
+                                       reconcile_interval=self.reconcile_interval)
+        self.mirror.sync()
+        doc_ids = [doc["_id"] for doc in self.collection.find(query, {"_id": 1})] if query is not None else None
 
+        # Documents deleted since the last sync are still alive in the mirror, so ask it for a
+        # few extra hits, drop the ones that no longer exist and retry with more if short of k
+        wanted = k + max(4, k // 2)
+        while True:
+            hits = self.mirror.search(target_embedding, wanted, doc_ids)
+            docs = {doc['_id']: doc for doc in self.collection.find({"_id": {"$in": [doc_id for doc_id, _, _ in hits]}})}
+            for doc_id, _, _ in hits:
+                if doc_id not in docs:
+                    self.mirror.remove(doc_id)
+            found = [docs[doc_id] for doc_id, _, _ in hits if doc_id in docs]
+            if len(found) >= k or len(hits) < wanted:
+                return found[:k]
+            wanted *= 2
+
+    def _find_similar_vectors_scan(self, target_embedding, k=5, query=None):
+        """Brute-force search over the whole collection (or `query` matches), without the local mirror."""
+        all_documents = list(self.collection.find(query or {}))
+        if not all_documents:
+            return []
+        embeddings = np.stack([decode_values(doc['embedding']) for doc in all_documents])
+        target = np.asarray(target_embedding, dtype=np.float32)
+        similarities = embeddings @ target / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(target))
+        top = np.argsort(-similarities)[:k]
+        return [all_documents[i] for i in top]
 
     def delete_document(self, doc_id=None, name=None):
         query = {}
@@ -91,31 +268,176 @@ class VectorDatabase:
         else:
             raise ValueError("Either doc_id or name must be provided.")
         
+        if self.mirror is not None:
+            # Look up the id so the mirror drops the row without waiting for a resync
+            deleted = self.collection.find_one_and_delete(query, projection={"_id": 1})
+            if deleted is None:
+                return 0
+            self.mirror.remove(deleted["_id"])
+            return 1
+
         delete_result = self.collection.delete_one(query)
         return delete_result.deleted_count  # Returns the number of documents deleted
 
-# MongoDB connection URI and certificate
-uri = "mongodb+srv://guavadb.oingz.mongodb.net/?authSource=%24external&authMechanism=MONGODB-X509&retryWrites=true&w=majority&appName=guavadb"
-cert_file = 'storage/certificates/X509-cert-3512411630284717239.pem'
+    def delete_documents(self, names, chunk_size=1000):
+        """Delete documents by name with one delete_many per chunk; returns the number deleted."""
+        deleted = 0
+        names = iter(names)
+        while True:
+            chunk = list(islice(names, chunk_size))
+            if not chunk:
+                break
+            if self.mirror is None:
+                deleted += self.collection.delete_many({"name": {"$in": chunk}}).deleted_count
+                continue
+            # Look up the ids so the mirror drops the rows without waiting for a resync
+            doc_ids = [doc["_id"] for doc in self.collection.find({"name": {"$in": chunk}}, {"_id": 1})]
+            deleted += self.collection.delete_many({"_id": {"$in": doc_ids}}).deleted_count
+            for doc_id in doc_ids:
+                self.mirror.remove(doc_id)
+        return deleted
+
+
+class AsyncVectorDatabase(MongoDocuments):
+    """
+    asyncio client for the same collection as VectorDatabase, backed by motor.
+
+    Nothing connects until the first operation, so constructing one at import or startup
+    time is free. All operations share one pooled client: `max_pool_size` bounds the
+    concurrent sockets, so several upserts can run while the matcher keeps encoding.
+
+    It is a write path only: similarity search is served by the matcher's local index, or
+    by VectorDatabase.find_similar_vectors over its in-memory mirror.
+    """
+
+    def __init__(self, uri, tls_cert_file, vector_format='list', max_pool_size=20, min_pool_size=0,
+                 max_idle_time_ms=60000, connect_timeout_ms=10000, server_selection_timeout_ms=30000):
+        if AsyncIOMotorClient is None:
+            raise ImportError("motor is required for AsyncVectorDatabase (pip install motor).")
+        self.uri = uri
+        self.tls_cert_file = tls_cert_file
+        self.vector_format = vector_format
+        self.pool_options = {
+            'maxPoolSize': max_pool_size,
+            'minPoolSize': min_pool_size,
+            'maxIdleTimeMS': max_idle_time_ms,
+            'connectTimeoutMS': connect_timeout_ms,
+            'serverSelectionTimeoutMS': server_selection_timeout_ms,
+        }
+        self.client = None
+        self._collection = None
+        self._name_index_ready = False
+
+    @property
+    def collection(self):
+        # Created on first use so the client binds to the running event loop
+        if self._collection is None:
+            self.client = AsyncIOMotorClient(
+                self.uri,
+                tls=True,
+                tlsCertificateKeyFile=self.tls_cert_file,
+                **self.pool_options
+            )
+            self._collection = self.client['quavadb']['pussy']
+        return self._collection
 
-db = VectorDatabase(uri, cert_file)
+    async def add_documents(self, documents):
+        """Insert documents ('name', 'embedding') and return their ids."""
+        for doc in documents:
+            if len(doc['embedding']) != 4096:
+                raise ValueError("Each embedding must be 4096-dimensional.")
+        mongo_documents = [self._to_mongo_document(doc['name'], doc['embedding']) for doc in documents]
+        insert_result = await self.collection.insert_many(mongo_documents)
+        return insert_result.inserted_ids
 
-# Example 1536-dimensional embedding
-#embedding = [0.72] * 1536  # Just an example. Replace with actual embedding from Ollama.
+    async def add_document(self, name, embedding, metadata=None):
+        """Insert or replace the embedding stored under `name`."""
+        document = {'name': name, 'embedding': embedding}
+        if metadata is not None:
+            document['metadata'] = metadata
+        return await self.upsert_documents([document])
+
+    async def upsert_documents(self, documents, chunk_size=500, max_retries=3, retry_backoff=0.5):
+        """
+        Insert or replace many embeddings keyed by document name.
+
+        Same arguments and return value as VectorDatabase.upsert_documents; retries back off
+        with asyncio.sleep so the event loop keeps running in between.
+        """
+        if not self._name_index_ready:
+            await self.collection.create_index("name")
+            for field in METADATA_FIELDS:
+                await self.collection.create_index(f"metadata.{field}")
+            self._name_index_ready = True
 
-# Add a document with a 1536-dimensional embedding
-#db.add_document("Test Document", embedding)
+        stats = {'upserted': 0, 'modified': 0, 'failed': 0}
+        documents = iter(documents)
+        while True:
+            chunk = list(islice(documents, chunk_size))
+            if not chunk:
+                break
+            operations = [self._upsert_operation(doc) for doc in chunk]
 
-#embedding = [0.18] * 1536  # Just an example. Replace with actual embedding from Ollama.
-#db.add_document("Test2 Document", embedding)
+            for attempt in range(max_retries):
+                try:
+                    result = await self.collection.bulk_write(operations, ordered=False)
+                    stats['upserted'] += result.upserted_count
+                    stats['modified'] += result.modified_count
+                    break
+                except (BulkWriteError, PyMongoError) as e:
+                    if attempt == max_retries - 1:
+                        print(f"Failed to upsert chunk of {len(chunk)} documents after {max_retries} attempts: {e}")
+                        stats['failed'] += len(chunk)
+                    else:
+                        await asyncio.sleep(retry_backoff * (2 ** attempt))
+        return stats
 
-# Find similar vectors
-#target_embedding = [0.5] * 1536  # Example target embedding
-#similar_docs = db.find_similar_vectors(target_embedding)
+    async def read_document(self, doc_id=None, name=None):
+        query = {}
+        if doc_id:
+            query["_id"] = ObjectId(doc_id)
+        elif name:
+            query["name"] = name
+        else:
+            raise ValueError("Either doc_id or name must be provided.")
+        return await self.collection.find_one(query)
+
+    async def delete_document(self, doc_id=None, name=None):
+        query = {}
+        if doc_id:
+            query["_id"] = ObjectId(doc_id)
+        elif name:
+            query["name"] = name
+        else:
+            raise ValueError("Either doc_id or name must be provided.")
+        delete_result = await self.collection.delete_one(query)
+        return delete_result.deleted_count
 
-#print(similar_docs)
+    async def update_metadata(self, documents, chunk_size=500):
+        """Set the metadata of existing documents ('name', 'metadata') without rewriting their vectors."""
+        matched = 0
+        documents = iter(documents)
+        while True:
+            chunk = list(islice(documents, chunk_size))
+            if not chunk:
+                break
+            result = await self.collection.bulk_write([self._metadata_operation(doc) for doc in chunk], ordered=False)
+            matched += result.matched_count
+        return matched
 
-#for doc in similar_docs:
-#    print(type(doc))
+    async def delete_documents(self, names, chunk_size=1000):
+        """Delete documents by name with one delete_many per chunk; returns the number deleted."""
+        deleted = 0
+        names = iter(names)
+        while True:
+            chunk = list(islice(names, chunk_size))
+            if not chunk:
+                break
+            deleted += (await self.collection.delete_many({"name": {"$in": chunk}})).deleted_count
+        return deleted
 
-#delete_document = db.delete_document(name="Test Document")
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+            self._collection = None
@@ -0,0 +1,337 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from itertools import islice
+import numpy as np
+from storage.backends import VectorBackend
+from embeddings.vector_store import MmapVectorStore
+from data.event_models import METADATA_FILTERS, end_date_bounds
+
+
+class EmbeddedVectorDatabase(VectorBackend):
+    """
+    Single-node vector database for laptops, CI and single-machine deployments.
+
+    Metadata lives in SQLite (`documents.sqlite`) with indexes on name and the filterable
+    metadata columns; vectors live in an append-only memory-mapped float32 file. An upsert
+    appends a new vector row and repoints the document at it, so existing rows are never
+    rewritten. Once the file holds more than `compact_ratio` rows per live document,
+    `compact()` rewrites it with only the live rows. Searches score only the rows of live
+    documents, optionally prefiltered by SQL, reading the file in contiguous chunks.
+    """
+
+    def __init__(self, path, dim=4096, compact_ratio=2.0, chunk_size=8192):
+        self.path = path
+        self.dim = dim
+        self.compact_ratio = compact_ratio
+        self.chunk_size = chunk_size
+        os.makedirs(path, exist_ok=True)
+        # One connection shared by the writer thread and searches, serialized by a lock
+        self.conn = sqlite3.connect(os.path.join(path, 'documents.sqlite'), check_same_thread=False)
+        self.lock = threading.RLock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            # The current vector file's name; compaction switches it in the same transaction
+            # that repoints the documents, so the two never disagree after a crash
+            self.conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT UNIQUE NOT NULL,
+                    row INTEGER NOT NULL,
+                    source TEXT,
+                    status TEXT,
+                    end_date REAL,
+                    liquidity REAL
+                )
+            """)
+            for column in ('source', 'status', 'end_date', 'liquidity'):
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_documents_{column} ON documents ({column})")
+            current = self.conn.execute("SELECT value FROM settings WHERE key = 'vectors'").fetchone()
+        self.vectors = MmapVectorStore(path, current[0] if current else 'vectors', dim=dim)
+        self._live_rows = None
+        self._norms = np.empty(0, dtype=np.float32)
+
+    def _check_dim(self, embedding):
+        if len(embedding) != self.dim:
+            raise ValueError(f"Each embedding must be {self.dim}-dimensional.")
+
+    @staticmethod
+    def _metadata_columns(metadata):
+        metadata = metadata or {}
+        end_date = metadata.get('end_date')
+        return (
+            metadata.get('source'),
+            metadata.get('status'),
+            end_date.timestamp() if isinstance(end_date, datetime) else None,
+            metadata.get('liquidity'),
+        )
+
+    def _write(self, documents, replace):
+        for doc in documents:
+            self._check_dim(doc['embedding'])
+        names = [doc['name'] for doc in documents]
+        with self.lock:
+            first_row = len(self.vectors)
+            existing = {
+                name for (name,) in self.conn.execute(
+                    f"SELECT name FROM documents WHERE name IN ({','.join('?' * len(names))})", names
+                )
+            }
+            verb = "INSERT OR REPLACE" if replace else "INSERT"
+            with self.conn:
+                # OR REPLACE keeps the name unique; the old row stays in the vector file until compact()
+                self.conn.executemany(
+                    f"""{verb} INTO documents (id, name, row, source, status, end_date, liquidity)
+                        VALUES ((SELECT id FROM documents WHERE name = ?), ?, ?, ?, ?, ?, ?)""",
+                    [
+                        (doc['name'], doc['name'], first_row + i, *self._metadata_columns(doc.get('metadata')))
+                        for i, doc in enumerate(documents)
+                    ],
+                )
+                # Vectors are appended only once the rows are in (e.g. no IntegrityError) and
+                # before the commit, so a failed append rolls the rows back
+                self.vectors.append(names, np.stack([np.asarray(doc['embedding']) for doc in documents]))
+            self._live_rows = None
+        return existing
+
+    def add_documents(self, documents):
+        documents = list(documents)
+        if not documents:
+            return []
+        self._write(documents, replace=False)
+        names = [doc['name'] for doc in documents]
+        with self.lock:
+            ids = dict(self.conn.execute(
+                f"SELECT name, id FROM documents WHERE name IN ({','.join('?' * len(names))})", names
+            ).fetchall())
+        return [ids[name] for name in names]
+
+    def upsert_documents(self, documents, chunk_size=500, max_retries=3, retry_backoff=0.5):
+        # Local writes don't fail transiently, so retry options are accepted for interface parity only
+        stats = {'upserted': 0, 'modified': 0, 'failed': 0}
+        documents = iter(documents)
+        while True:
+            chunk = list(islice(documents, chunk_size))
+            if not chunk:
+                break
+            existing = self._write(chunk, replace=True)
+            stats['modified'] += len(existing)
+            stats['upserted'] += len(chunk) - len(existing)
+        if stats['modified']:
+            self.maybe_compact()
+        return stats
+
+    def maybe_compact(self):
+        """Compact once replaced vectors make up too much of the file; returns the rows reclaimed."""
+        with self.lock:
+            (live,) = self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()
+            if len(self.vectors) <= max(live, self.chunk_size) * self.compact_ratio:
+                return 0
+            return self.compact()
+
+    def compact(self):
+        """
+        Rewrite the vector file with only the rows of live documents, in row order, and
+        repoint the documents at their new rows. Returns the number of rows reclaimed.
+        """
+        with self.lock:
+            live = self.conn.execute("SELECT id, name, row FROM documents ORDER BY row").fetchall()
+            reclaimed = len(self.vectors) - len(live)
+            if reclaimed <= 0:
+                return 0
+            old = self.vectors
+            generation = int(old.name.rpartition('-')[2]) + 1 if old.name != 'vectors' else 1
+            compacted = MmapVectorStore(self.path, f"vectors-{generation}", dim=self.dim)
+            # Leftovers of a compaction interrupted before its commit
+            self._remove_files(compacted)
+            compacted.open()
+            for start in range(0, len(live), self.chunk_size):
+                part = live[start:start + self.chunk_size]
+                compacted.append([name for _, name, _ in part], old.matrix[[row for _, _, row in part]])
+            with self.conn:
+                self.conn.executemany("UPDATE documents SET row = ? WHERE id = ?",
+                                      [(row, doc_id) for row, (doc_id, _, _) in enumerate(live)])
+                self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('vectors', ?)",
+                                  (compacted.name,))
+            self.vectors = compacted
+            self._live_rows = None
+            self._norms = np.empty(0, dtype=np.float32)
+            self._remove_files(old)
+        print(f"Compacted the embedded vector database: {reclaimed} unreferenced rows reclaimed.")
+        return reclaimed
+
+    @staticmethod
+    def _remove_files(store):
+        store.matrix = None
+        for path in (store.matrix_path, store.keys_path, store.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _document(self, row_values, with_values=True):
+        doc_id, name, row, source, status, end_date, liquidity = row_values
+        document = {
+            '_id': doc_id,
+            'name': name,
+            'embedding': {
+                "type": "vector",
+                "path": "embedding",
+                "numDimensions": self.dim,
+                "similarity": "cosine",
+            },
+            'metadata': {
+                'source': source,
+                'status': status,
+                'end_date': datetime.fromtimestamp(end_date, timezone.utc) if end_date is not None else None,
+                'liquidity': liquidity,
+            },
+        }
+        if with_values:
+            document['embedding']['values'] = self.vectors.matrix[row].tolist()
+        return document
+
+    def read_document(self, doc_id=None, name=None):
+        if doc_id:
+            query, value = "id = ?", int(doc_id)
+        elif name:
+            query, value = "name = ?", name
+        else:
+            raise ValueError("Either doc_id or name must be provided.")
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT id, name, row, source, status, end_date, liquidity FROM documents WHERE {query}", (value,)
+            ).fetchone()
+            return self._document(row) if row else None
+
+    def _filter_sql(self, filters):
+        unknown = set(filters) - set(METADATA_FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown filters {sorted(unknown)}. Expected any of {METADATA_FILTERS}.")
+        clauses, params = [], []
+        for column in ('source', 'status'):
+            wanted = filters.get(column)
+            if wanted is not None:
+                wanted = [wanted] if isinstance(wanted, str) else list(wanted)
+                clauses.append(f"{column} IN ({','.join('?' * len(wanted))})")
+                params.extend(wanted)
+        after, before = end_date_bounds(filters)
+        if after is not None:
+            clauses.append("end_date >= ?")
+            params.append(after.timestamp())
+        if before is not None:
+            clauses.append("end_date <= ?")
+            params.append(before.timestamp())
+        if filters.get('min_liquidity') is not None:
+            clauses.append("liquidity >= ?")
+            params.append(filters['min_liquidity'])
+        if filters.get('max_liquidity') is not None:
+            clauses.append("liquidity <= ?")
+            params.append(filters['max_liquidity'])
+        return " AND ".join(clauses) or "1", params
+
+    def _norms_for(self, rows):
+        # Vector norms are cached per row; rows are append-only so cached norms never go stale
+        if len(self._norms) < len(self.vectors):
+            norms = [self._norms]
+            for start in range(len(self._norms), len(self.vectors), self.chunk_size):
+                norms.append(np.linalg.norm(self.vectors.matrix[start:start + self.chunk_size], axis=1))
+            self._norms = np.concatenate(norms)
+        return self._norms[rows]
+
+    def _scores(self, rows, target):
+        """
+        Dot products of sorted `rows` with `target`. The file is read in contiguous slices of
+        up to `chunk_size` rows starting at the next eligible row, so runs of dead or filtered
+        rows are skipped and nothing catalogue-sized is copied; rows inside a slice that
+        aren't eligible are dropped after scoring.
+        """
+        scores = np.empty(len(rows), dtype=np.float32)
+        position = 0
+        while position < len(rows):
+            start = int(rows[position])
+            end = position + int(np.searchsorted(rows[position:], start + self.chunk_size))
+            part = rows[position:end]
+            chunk = self.vectors.matrix[start:int(part[-1]) + 1]
+            scores[position:end] = (chunk @ target)[part - start]
+            position = end
+        return scores
+
+    def find_similar_vectors(self, target_embedding, k=5, filters=None):
+        """Find the k documents most similar to the target, scoring only eligible rows."""
+        self._check_dim(target_embedding)
+        with self.lock:
+            if filters:
+                where, params = self._filter_sql(filters)
+                rows = np.array([row for (row,) in self.conn.execute(f"SELECT row FROM documents WHERE {where}", params)],
+                                dtype=np.int64)
+            else:
+                if self._live_rows is None:
+                    self._live_rows = np.array([row for (row,) in self.conn.execute("SELECT row FROM documents")],
+                                               dtype=np.int64)
+                rows = self._live_rows
+            if not len(rows):
+                return []
+            rows = np.sort(rows)
+            target = np.asarray(target_embedding, dtype=np.float32)
+            norms = self._norms_for(rows) * (np.linalg.norm(target) or 1.0)
+            norms[norms == 0] = 1.0
+            scores = self._scores(rows, target) / norms
+            k = min(k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            top_rows = [int(rows[i]) for i in top]
+            found = {
+                row_values[2]: row_values for row_values in self.conn.execute(
+                    f"SELECT id, name, row, source, status, end_date, liquidity FROM documents "
+                    f"WHERE row IN ({','.join('?' * len(top_rows))})", top_rows
+                )
+            }
+            return [self._document(found[row]) for row in top_rows if row in found]
+
+    def delete_document(self, doc_id=None, name=None):
+        if doc_id:
+            query, value = "id = ?", int(doc_id)
+        elif name:
+            query, value = "name = ?", name
+        else:
+            raise ValueError("Either doc_id or name must be provided.")
+        with self.lock, self.conn:
+            deleted = self.conn.execute(f"DELETE FROM documents WHERE {query}", (value,)).rowcount
+            self._live_rows = None
+        return deleted
+
+    def update_metadata(self, documents, chunk_size=500):
+        """Set the metadata columns of existing documents without appending vector rows."""
+        matched = 0
+        documents = iter(documents)
+        while True:
+            chunk = list(islice(documents, chunk_size))
+            if not chunk:
+                break
+            with self.lock, self.conn:
+                for doc in chunk:
+                    matched += self.conn.execute(
+                        "UPDATE documents SET source = ?, status = ?, end_date = ?, liquidity = ? WHERE name = ?",
+                        (*self._metadata_columns(doc.get('metadata')), doc['name'])
+                    ).rowcount
+        return matched
+
+    def delete_documents(self, names, chunk_size=500):
+        """Delete documents by name with one DELETE per chunk; returns the number deleted."""
+        deleted = 0
+        names = iter(names)
+        while True:
+            chunk = list(islice(names, chunk_size))
+            if not chunk:
+                break
+            with self.lock, self.conn:
+                deleted += self.conn.execute(
+                    f"DELETE FROM documents WHERE name IN ({','.join('?' * len(chunk))})", chunk
+                ).rowcount
+                self._live_rows = None
+        return deleted
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,71 @@
+import argparse
+import os
+import time
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+from storage.db import VectorDatabase
+from storage.vector_codec import VECTOR_FORMATS, encode_values, decode_values
+
+
+def migrate_vectors(vector_db, target_format='float32', batch_size=500, limit=None, dry_run=False):
+    """
+    Rewrite stored embeddings into `target_format` in batches.
+
+    Only documents not already in the target format are touched, so the migration can be
+    interrupted and re-run safely. Returns the number of documents rewritten.
+    """
+    if target_format == 'list':
+        query = {"embedding.dtype": {"$exists": True}}
+    else:
+        query = {"embedding.dtype": {"$ne": target_format}}
+
+    total = vector_db.collection.count_documents(query)
+    if limit is not None:
+        total = min(total, limit)
+    print(f"{total} documents to migrate to '{target_format}'.")
+
+    migrated = 0
+    start = time.perf_counter()
+    cursor = vector_db.collection.find(query, {"embedding": 1}).batch_size(batch_size)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+
+    operations = []
+    for doc in cursor:
+        fields = encode_values(decode_values(doc['embedding']), target_format)
+        update = {"$set": {f"embedding.{key}": value for key, value in fields.items()}}
+        if target_format == 'list':
+            update["$unset"] = {"embedding.dtype": ""}
+        operations.append(UpdateOne({"_id": doc["_id"]}, update))
+        if len(operations) >= batch_size:
+            migrated += _flush(vector_db, operations, dry_run)
+            operations = []
+            print(f"Migrated {migrated}/{total} documents ({migrated / (time.perf_counter() - start):.0f} docs/sec)")
+    if operations:
+        migrated += _flush(vector_db, operations, dry_run)
+    print(f"Migrated {migrated} documents to '{target_format}' in {time.perf_counter() - start:.1f}s.")
+    return migrated
+
+
+def _flush(vector_db, operations, dry_run):
+    if dry_run:
+        return len(operations)
+    result = vector_db.collection.bulk_write(operations, ordered=False)
+    return result.modified_count
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Rewrite stored embeddings in a compact binary format.")
+    parser.add_argument('--format', default='float32', choices=sorted(VECTOR_FORMATS))
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    vector_db = VectorDatabase(os.getenv("MONGO_URI"), os.getenv("MONGO_CERT_FILE"), use_mirror=False)
+    migrate_vectors(vector_db, args.format, args.batch_size, args.limit, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
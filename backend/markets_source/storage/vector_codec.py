@@ -0,0 +1,38 @@
+import numpy as np
+from bson.binary import Binary
+
+# 'list' keeps the original array of BSON doubles; the others pack the values into BSON binary
+VECTOR_FORMATS = {
+    'list': None,
+    'float32': np.dtype('<f4'),
+    'float16': np.dtype('<f2'),
+}
+
+
+def encode_values(embedding, vector_format='list'):
+    """
+    Return the fields describing an embedding's values for the given storage format.
+
+    Binary formats store little-endian packed values plus 'dtype' so readers can decode
+    with np.frombuffer; a 4096-dim float32 vector is 16 KB instead of ~37 KB of doubles.
+    """
+    if vector_format not in VECTOR_FORMATS:
+        raise ValueError(f"Unknown vector format '{vector_format}'. Expected one of {sorted(VECTOR_FORMATS)}.")
+    dtype = VECTOR_FORMATS[vector_format]
+    if dtype is None:
+        values = embedding.tolist() if isinstance(embedding, np.ndarray) else list(embedding)
+        return {"values": values}
+    values = np.asarray(embedding).astype(dtype, copy=False)
+    return {"values": Binary(values.tobytes()), "dtype": vector_format}
+
+
+def decode_values(embedding_field):
+    """Decode an 'embedding' sub-document in either format to a float32 NumPy array."""
+    values = embedding_field['values']
+    dtype = embedding_field.get('dtype')
+    if dtype is None:
+        return np.asarray(values, dtype=np.float32)
+    if dtype not in VECTOR_FORMATS or VECTOR_FORMATS[dtype] is None:
+        raise ValueError(f"Unknown stored vector dtype '{dtype}'.")
+    decoded = np.frombuffer(values, dtype=VECTOR_FORMATS[dtype], count=embedding_field.get('numDimensions', -1))
+    return decoded.astype(np.float32, copy=False)
@@ -0,0 +1,210 @@
+import time
+import numpy as np
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+from storage.vector_codec import decode_values
+
+VECTOR_PROJECTION = {'name': 1, 'vector_version': 1, 'embedding.values': 1, 'embedding.dtype': 1,
+                     'embedding.numDimensions': 1}
+
+
+class VectorMirror:
+    """
+    Local in-memory mirror of a MongoDB vector collection.
+
+    Embeddings are kept unit-normalized in one contiguous float32 matrix next to the
+    document ids and names, so a search is a single matrix-vector product plus a
+    partial sort instead of a network scan of the whole collection.
+
+    `sync()` is incremental. By default it tails a change stream, which picks up inserts,
+    replaced vectors and deletes made by any process. Change streams need a replica set;
+    without one (or with `use_change_stream=False`) it pulls documents whose ObjectId is
+    newer than the last one seen (ids grow with insertion time) and, every
+    `reconcile_interval` seconds, reconciles the mirrored ids and vector versions with the
+    collection to catch replaced and deleted documents.
+    """
+
+    def __init__(self, collection, dim=4096, use_change_stream=True, batch_size=1000, reconcile_interval=300):
+        self.collection = collection
+        self.dim = dim
+        self.use_change_stream = use_change_stream
+        self.batch_size = batch_size
+        self.reconcile_interval = reconcile_interval
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.alive = np.empty(0, dtype=bool)
+        self.ids = []
+        self.names = []
+        self.versions = []
+        self.rows = {}
+        self.rows_by_name = {}
+        self.count = 0
+        self.last_id = None
+        self._stream = None
+        self._reconciled_at = time.monotonic()
+
+    def __len__(self):
+        return int(self.alive[:self.count].sum())
+
+    def _reserve(self, extra):
+        # Grow geometrically so appends stay amortized O(1)
+        needed = self.count + extra
+        if needed <= len(self.vectors):
+            return
+        capacity = max(needed, 2 * len(self.vectors), 1024)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:self.count] = self.vectors[:self.count]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.count] = self.alive[:self.count]
+        self.vectors, self.alive = vectors, alive
+
+    @staticmethod
+    def _values(doc):
+        return decode_values(doc['embedding'])
+
+    def _normalized(self, values):
+        vector = np.asarray(values, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def upsert(self, doc):
+        vector = self._normalized(self._values(doc))
+        if vector is None:
+            return
+        row = self.rows.get(doc['_id'])
+        if row is None:
+            self._reserve(1)
+            row = self.count
+            self.count += 1
+            self.ids.append(doc['_id'])
+            self.names.append(doc.get('name'))
+            self.versions.append(doc.get('vector_version'))
+            self.rows[doc['_id']] = row
+        else:
+            self.names[row] = doc.get('name')
+            self.versions[row] = doc.get('vector_version')
+        self.rows_by_name[doc.get('name')] = row
+        self.vectors[row] = vector
+        self.alive[row] = True
+
+    def update_by_name(self, name, values):
+        """Replace the vector of an already mirrored document; False if it isn't mirrored yet."""
+        row = self.rows_by_name.get(name)
+        vector = self._normalized(values)
+        if row is None or vector is None:
+            return False
+        self.vectors[row] = vector
+        return True
+
+    def remove(self, doc_id):
+        row = self.rows.get(doc_id)
+        if row is not None:
+            self.alive[row] = False
+
+    def _pull_since_last_id(self):
+        query = {'_id': {'$gt': self.last_id}} if self.last_id is not None else {}
+        cursor = self.collection.find(query, VECTOR_PROJECTION).sort('_id', ASCENDING).batch_size(self.batch_size)
+        pulled = 0
+        for doc in cursor:
+            self.upsert(doc)
+            self.last_id = doc['_id']
+            pulled += 1
+        return pulled
+
+    def _drain_change_stream(self):
+        applied = 0
+        while self._stream.alive:
+            change = self._stream.try_next()
+            if change is None:
+                break
+            operation = change['operationType']
+            if operation in ('insert', 'update', 'replace') and change.get('fullDocument'):
+                self.upsert(change['fullDocument'])
+            elif operation == 'delete':
+                self.remove(change['documentKey']['_id'])
+            applied += 1
+        return applied
+
+    def reconcile(self):
+        """
+        Compare the mirror with the collection's ids and vector versions and apply what an
+        id-ordered pull can't see: deleted documents and vectors replaced under an existing
+        id. Only ids and versions are scanned; vectors are fetched for the stale documents.
+        Returns the number of rows removed or refreshed.
+        """
+        seen = set()
+        stale = []
+        for doc in self.collection.find({}, {'_id': 1, 'vector_version': 1}).batch_size(10 * self.batch_size):
+            seen.add(doc['_id'])
+            row = self.rows.get(doc['_id'])
+            if row is None or not self.alive[row] or self.versions[row] != doc.get('vector_version'):
+                stale.append(doc['_id'])
+        removed = [doc_id for doc_id, row in self.rows.items() if self.alive[row] and doc_id not in seen]
+        for doc_id in removed:
+            self.remove(doc_id)
+        for start in range(0, len(stale), self.batch_size):
+            for doc in self.collection.find({'_id': {'$in': stale[start:start + self.batch_size]}}, VECTOR_PROJECTION):
+                self.upsert(doc)
+                if self.last_id is None or doc['_id'] > self.last_id:
+                    self.last_id = doc['_id']
+        self._reconciled_at = time.monotonic()
+        return len(removed) + len(stale)
+
+    def _sync_change_stream(self):
+        if self._stream is not None and not self._stream.alive:
+            # Invalidated (e.g. the collection was dropped); reopen and catch up below
+            self.close()
+        if self._stream is None:
+            # Open the stream before loading so nothing written in between is lost; a reopened
+            # stream missed whatever happened while it was closed, so reconcile first
+            self._stream = self.collection.watch(full_document='updateLookup')
+            applied = self.reconcile() if self.count else 0
+            return applied + self._pull_since_last_id() + self._drain_change_stream()
+        return self._drain_change_stream()
+
+    def sync(self):
+        """Bring the mirror up to date; returns the number of documents/changes applied."""
+        if self.use_change_stream:
+            try:
+                return self._sync_change_stream()
+            except PyMongoError as e:
+                # e.g. a standalone server: change streams need a replica set
+                print(f"Change stream unavailable ({e}); polling with periodic reconciles instead.")
+                self.close()
+                self.use_change_stream = False
+        applied = self._pull_since_last_id()
+        if time.monotonic() - self._reconciled_at >= self.reconcile_interval:
+            applied += self.reconcile()
+        return applied
+
+    def search(self, target_embedding, k=5, doc_ids=None):
+        """
+        Top-k (doc_id, name, cosine similarity) against the mirrored vectors, optionally
+        restricted to the rows of `doc_ids`.
+        """
+        query = np.asarray(target_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        if doc_ids is None:
+            # Score the contiguous matrix in place and mask deleted rows
+            rows = np.arange(self.count)
+            scores = self.vectors[:self.count] @ query
+            scores[~self.alive[:self.count]] = -np.inf
+            k = min(k, len(self))
+        else:
+            rows = np.array([self.rows[doc_id] for doc_id in doc_ids if doc_id in self.rows], dtype=np.int64)
+            rows = rows[self.alive[rows]] if len(rows) else rows
+            scores = self.vectors[rows] @ query
+            k = min(k, len(rows))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[rows[i]], self.names[rows[i]], float(scores[i])) for i in top]
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None